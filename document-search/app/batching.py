@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from concurrent import futures
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent (query, k, options) lookups into micro-batches.
+
+    Requests wait on an asyncio queue; a single worker drains up to `max_batch_size` of them,
+    waiting at most `max_wait_ms` after the first one arrives, and hands the whole batch to
+    `search_batch` on a dedicated thread so embedding runs as one forward pass and FAISS as
+    one search call without blocking the event loop.
+    """
+
+    def __init__(self, search_batch, max_batch_size=32, max_wait_ms=5):
+        self.search_batch = search_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = asyncio.Queue()
+        self._executor = futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="micro-batch")
+        self._worker = None
+
+    def start(self):
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, query, k, options):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, k, options, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Requests whose caller went away (cancelled RPC) are not worth embedding.
+            batch = [item for item in batch if not item[-1].done()]
+            if not batch:
+                continue
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.search_batch, [item[:-1] for item in batch]
+                )
+            except Exception as e:
+                logging.exception("micro-batch failed.")
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            # search_batch returns the exception of a failed options group in place of its results.
+            for (*_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -0,0 +1,55 @@
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Collapse whitespace and unicode variants so near-identical queries share a cache key."""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+class LRUCache:
+    """Thread-safe bounded mapping with least-recently-used eviction and hit/miss counters."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return dict(
+                size=len(self._data),
+                maxsize=self.maxsize,
+                hits=self.hits,
+                misses=self.misses,
+                hit_ratio=self.hits / lookups if lookups else 0.0,
+            )
@@ -0,0 +1,176 @@
+import json
+import pickle
+import queue
+import shutil
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+import faiss
+from langchain_core.documents import Document
+
+INDEX_FILE = "index.faiss"
+PICKLE_FILE = "index.pkl"
+DOCSTORE_FILE = "docstore.sqlite"
+MANIFEST_FILE = "manifest.json"
+# build.py publishes every build into VERSIONS_DIR/<build> and then repoints the CURRENT_LINK symlink.
+VERSIONS_DIR = "versions"
+CURRENT_LINK = "current"
+CHUNK_COLUMNS = "(position INTEGER PRIMARY KEY, id TEXT NOT NULL, content TEXT NOT NULL, metadata TEXT NOT NULL)"
+# Docstore connections per snapshot, one for each thread of the gRPC server.
+DOCSTORE_CONNECTIONS = 10
+
+
+class SQLiteDocstore:
+    """
+    Chunk text and metadata keyed by FAISS row position, kept on disk and read only
+    for the hits of a search.
+
+    All connections are opened when the snapshot loads, so they stay on the file the snapshot's
+    index was built with even after a rebuild replaces docstore.sqlite at the same path; opening
+    by path later could resolve positions against the new chunks. They are opened immutable (no
+    locks, no journal), which also lets prefork workers use the ones they inherit from the parent.
+    """
+
+    def __init__(self, path, connections=DOCSTORE_CONNECTIONS):
+        self.path = str(path)
+        self._idle = queue.LifoQueue()
+        for _ in range(connections):
+            self._idle.put(
+                sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            )
+
+    @contextmanager
+    def _connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def __len__(self):
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def get(self, positions):
+        """Map FAISS row positions to Documents."""
+        positions = [int(position) for position in positions]
+        if not positions:
+            return {}
+        with self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT position, id, content, metadata FROM chunks WHERE position IN ({','.join('?' * len(positions))})",
+                positions,
+            ).fetchall()
+        return {
+            position: Document(id=_id, page_content=content, metadata=json.loads(metadata))
+            for position, _id, content, metadata in rows
+        }
+
+
+class PickleDocstore:
+    """Adapter over a LangChain FAISS pickle (InMemoryDocstore + index_to_docstore_id)."""
+
+    def __init__(self, docstore, index_to_docstore_id):
+        self.docstore = docstore
+        self.index_to_docstore_id = index_to_docstore_id
+
+    def __len__(self):
+        return len(self.index_to_docstore_id)
+
+    def get(self, positions):
+        return {
+            int(position): self.docstore.search(self.index_to_docstore_id[int(position)])
+            for position in positions
+        }
+
+
+def snapshot_dir(vectorstore_dir):
+    """
+    The directory of the published snapshot: the target of the `current` link, resolved once so
+    every file of a load comes from the same build, or `vectorstore_dir` itself for a vectorstore
+    built before builds were versioned.
+    """
+    current = Path(vectorstore_dir) / CURRENT_LINK
+    return current.resolve() if current.is_symlink() else Path(vectorstore_dir)
+
+
+def load_manifest(vectorstore_dir):
+    path = Path(vectorstore_dir) / MANIFEST_FILE
+    if not path.is_file():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class DocstoreWriter:
+    """
+    Writes docstore.sqlite while build.py builds the index: each batch of chunks is inserted at
+    the row positions its vectors get, so the build never holds the chunk texts in memory. An
+    incremental build starts from a copy of the previous build's docstore.
+    """
+
+    def __init__(self, path, base=None):
+        if base is not None:
+            shutil.copyfile(base, path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS chunks {CHUNK_COLUMNS}")
+
+    def add(self, start, chunks):
+        """Insert (id, Document) `chunks` at positions start, start + 1, ..."""
+        self.conn.executemany(
+            "INSERT INTO chunks VALUES (?, ?, ?, ?)",
+            (
+                (start + i, _id, document.page_content, json.dumps(document.metadata, ensure_ascii=False))
+                for i, (_id, document) in enumerate(chunks)
+            ),
+        )
+
+    def remove(self, ids):
+        """
+        Delete the chunks with `ids` and renumber the rest to 0..n-1 in their order, as
+        IndexFlatCodes.remove_ids compacts the index. Returns the positions deleted.
+        """
+        self.conn.execute("CREATE TEMP TABLE stale (id TEXT PRIMARY KEY)")
+        self.conn.executemany("INSERT OR IGNORE INTO stale VALUES (?)", ((_id,) for _id in ids))
+        positions = [
+            position for (position,) in
+            self.conn.execute("SELECT position FROM chunks WHERE id IN (SELECT id FROM stale) ORDER BY position")
+        ]
+        self.conn.execute("DELETE FROM chunks WHERE id IN (SELECT id FROM stale)")
+        self.conn.execute("DROP TABLE stale")
+        self.conn.execute(f"CREATE TABLE renumbered {CHUNK_COLUMNS}")
+        self.conn.execute(
+            "INSERT INTO renumbered SELECT ROW_NUMBER() OVER (ORDER BY position) - 1, id, content, metadata FROM chunks"
+        )
+        self.conn.execute("DROP TABLE chunks")
+        self.conn.execute("ALTER TABLE renumbered RENAME TO chunks")
+        return positions
+
+    def rows(self):
+        """(position, content, metadata dict) of every chunk in position order, streamed from disk."""
+        self.conn.commit()
+        for position, content, metadata in self.conn.execute("SELECT position, content, metadata FROM chunks ORDER BY position"):
+            yield position, content, json.loads(metadata)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def load_store(vectorstore_dir):
+    """
+    Open the index and docstore of a saved vectorstore.
+
+    With docstore.sqlite present the FAISS index is memory-mapped read-only, so processes on
+    one host share its pages through the page cache and start up without reading it into the
+    heap. Older vectorstores without it fall back to reading index.faiss and unpickling index.pkl.
+    """
+    path = Path(vectorstore_dir)
+    if (path / DOCSTORE_FILE).is_file():
+        index = faiss.read_index(str(path / INDEX_FILE), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        return index, SQLiteDocstore(path / DOCSTORE_FILE)
+    index = faiss.read_index(str(path / INDEX_FILE))
+    with open(path / PICKLE_FILE, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return index, PickleDocstore(docstore, index_to_docstore_id)
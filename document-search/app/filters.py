@@ -0,0 +1,124 @@
+import bisect
+import json
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from app.cache import LRUCache
+
+METADATA_FILE = "metadata.npz"
+SELECTOR_CACHE_SIZE = 256
+
+
+def value_key(field, value):
+    """Sortable key of one metadata value; string values of a field sort together, so prefixes are ranges."""
+    return f"{field}\x00{json.dumps(value, ensure_ascii=False)}"
+
+
+def parse_filters(filters, from_metadata_value):
+    """
+    Canonical, hashable form of a request's MetadataFilter list: a sorted tuple of
+    ("in", field, value keys) and ("prefix", field, prefix) conditions, all of which must hold.
+    """
+    conditions = set()
+    for condition in filters:
+        kind = condition.WhichOneof("condition")
+        if not condition.field or kind is None:
+            raise ValueError(f"filter on {condition.field!r} needs a field and a condition")
+        values = [condition.equals] if kind == "equals" else list(condition.any_of.values) if kind == "any_of" else []
+        if any(value.WhichOneof("kind") is None for value in values):
+            raise ValueError(f"filter on {condition.field!r} has a value without a type")
+        if kind == "equals":
+            conditions.add(("in", condition.field, (value_key(condition.field, from_metadata_value(condition.equals)),)))
+        elif kind == "any_of":
+            keys = sorted({value_key(condition.field, from_metadata_value(value)) for value in condition.any_of.values})
+            conditions.add(("in", condition.field, tuple(keys)))
+        elif kind == "prefix":
+            conditions.add(("prefix", condition.field, condition.prefix))
+    return tuple(sorted(conditions))
+
+
+class MetadataIndex:
+    """
+    Inverted index from metadata values to FAISS row positions, in the same CSR layout as the
+    lexical index: the positions holding value key i are positions[offsets[i]:offsets[i + 1]].
+    A filter is turned into a bitmap over all rows once and cached; searches pass it to FAISS as
+    an IDSelectorBitmap, so only matching rows are scored and filtered queries still return k hits.
+    """
+
+    def __init__(self, keys, offsets, positions, size):
+        self.keys = keys
+        self.offsets = offsets
+        self.positions = positions
+        self.size = int(size)
+        self._masks = LRUCache(SELECTOR_CACHE_SIZE)
+
+    @classmethod
+    def build(cls, metadatas, size):
+        """`metadatas` is an iterable of (position, metadata dict) for `size` rows."""
+        postings = {}
+        for position, metadata in metadatas:
+            for field, value in metadata.items():
+                if isinstance(value, (str, int, float, bool)):
+                    postings.setdefault(value_key(field, value), []).append(position)
+        keys = sorted(postings)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[key]) for key in keys])
+        positions = np.fromiter((p for key in keys for p in postings[key]), dtype=np.int64, count=offsets[-1])
+        return cls(keys, offsets, positions, size)
+
+    def save(self, vectorstore_dir):
+        np.savez(Path(vectorstore_dir) / METADATA_FILE, keys=np.array(self.keys, dtype=str),
+                 offsets=self.offsets, positions=self.positions, size=self.size)
+
+    @classmethod
+    def load(cls, vectorstore_dir):
+        path = Path(vectorstore_dir) / METADATA_FILE
+        if not path.is_file():
+            return None
+        with np.load(path) as data:
+            return cls(data["keys"].tolist(), data["offsets"], data["positions"], data["size"])
+
+    def _key_range(self, start_key, end_key):
+        return bisect.bisect_left(self.keys, start_key), bisect.bisect_left(self.keys, end_key)
+
+    def _condition_mask(self, condition):
+        kind, field, arg = condition
+        mask = np.zeros(self.size, dtype=bool)
+        if kind == "in":
+            ranges = [self._key_range(key, key + "\x00") for key in arg]
+        else:
+            # A string prefix's JSON form, minus the closing quote, prefixes the JSON of every match.
+            start = value_key(field, arg)[:-1]
+            ranges = [self._key_range(start, start + "\U0010ffff")]
+        for lo, hi in ranges:
+            if lo < hi:
+                mask[self.positions[self.offsets[lo]:self.offsets[hi]]] = True
+        return mask
+
+    def _bitmaps(self, filters):
+        entry = self._masks.get(filters)
+        if entry is None:
+            mask = np.ones(self.size, dtype=bool)
+            for condition in filters:
+                mask &= self._condition_mask(condition)
+            entry = (mask, np.packbits(mask, bitorder="little"), int(mask.sum()))
+            self._masks.put(filters, entry)
+        return entry
+
+    def mask(self, filters):
+        """Boolean mask of the rows matching every condition of parsed `filters`."""
+        return self._bitmaps(filters)[0]
+
+    def count(self, filters):
+        """Number of rows matching every condition of parsed `filters`."""
+        return self._bitmaps(filters)[2]
+
+    def selector(self, filters):
+        """faiss.IDSelectorBitmap over the rows matching `filters`."""
+        bitmap = self._bitmaps(filters)[1]
+        # The length is in bytes of the packed bitmap; ids past it are not members.
+        selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+        selector.bitmap_ref = bitmap  # FAISS does not own the buffer
+        return selector
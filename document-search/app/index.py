@@ -0,0 +1,85 @@
+import math
+
+import faiss
+import numpy as np
+
+# Named presets for faiss.index_factory; any other spec is passed to index_factory as is.
+INDEX_PRESETS = {
+    "flat": "Flat",
+    "ivf-flat": "IVF{nlist},Flat",
+    "ivf-pq": "IVF{nlist},PQ{pq_m}",
+    "hnsw": "HNSW{hnsw_m}",
+    "sq8": "SQ8",
+    "sq-fp16": "SQfp16",
+}
+
+def index_description(spec, nlist=1024, pq_m=48, hnsw_m=32):
+    return INDEX_PRESETS.get(spec, spec).format(nlist=nlist, pq_m=pq_m, hnsw_m=hnsw_m)
+
+
+def make_index(description, dim):
+    return faiss.index_factory(dim, description, faiss.METRIC_L2)
+
+
+def supports_remove(index):
+    """
+    Whether deleting through LangChain's FAISS.delete keeps labels and docstore ids in step. It
+    renumbers index_to_docstore_id to 0..n-1, which matches only flat-code indexes (Flat, SQ, PQ):
+    their remove_ids compacts the remaining vectors. IVF keeps the old labels, HNSW cannot remove.
+    """
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlatCodes)
+
+
+def search_params(index, nprobe=0, ef_search=0, selector=None):
+    """
+    Per-call search parameters: nprobe / efSearch of approximate indexes (0 keeps the value stored
+    in the index) and an optional faiss.IDSelector restricting the rows searched.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and (nprobe or selector is not None):
+        return faiss.SearchParametersIVF(nprobe=nprobe or ivf.nprobe, sel=selector)
+    hnsw = faiss.downcast_index(index)
+    if isinstance(hnsw, faiss.IndexHNSW) and (ef_search or selector is not None):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or hnsw.hnsw.efSearch, sel=selector)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def filtered_nprobe(ivf, nprobe, k, selected):
+    """
+    nprobe for a search restricted to `selected` rows. The selector only drops rows inside the
+    probed lists, so the lists probed grow with the filter's selectivity until they are expected
+    to hold 2k matching rows; a filter matching at most 2k rows probes every list.
+    """
+    nprobe = nprobe or ivf.nprobe
+    if not selected:
+        return nprobe
+    return min(ivf.nlist, max(nprobe, math.ceil(ivf.nlist * min(2 * k, selected) / selected)))
+
+
+def _search(index, vectors, k, nprobe, ef_search, selector):
+    params = search_params(index, nprobe, ef_search, selector)
+    if params is None:
+        return index.search(vectors, k)
+    return index.search(vectors, k, params=params)
+
+
+def search(index, vectors, k, nprobe=0, ef_search=0, selector=None, selected=None):
+    """
+    index.search with per-call parameters, leaving the shared index untouched for other threads.
+
+    `selected` is the number of rows `selector` lets through. On IVF indexes a filtered search
+    raises nprobe by the filter's selectivity, and queries that still come back with fewer than
+    min(k, selected) hits are searched again over every list, so they get all the hits there are.
+    """
+    ivf = faiss.try_extract_index_ivf(index) if selector is not None else None
+    if ivf is None:
+        return _search(index, vectors, k, nprobe, ef_search, selector)
+    nprobe = filtered_nprobe(ivf, nprobe, k, selected)
+    scores, indices = _search(index, vectors, k, nprobe, ef_search, selector)
+    short = (indices != -1).sum(axis=1) < min(k, ivf.ntotal if selected is None else selected)
+    if nprobe < ivf.nlist and short.any():
+        rows = np.flatnonzero(short)
+        scores[rows], indices[rows] = _search(index, vectors[rows], k, ivf.nlist, ef_search, selector)
+    return scores, indices
@@ -0,0 +1,118 @@
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+LEXICAL_FILE = "lexical.npz"
+
+# Hangul words (with attached digits, e.g. "제3조"), or ASCII words possibly joined by . _ - : /
+# (IPs, hostnames, versions, identifiers).
+TOKEN_PATTERN = re.compile(r"[가-힣0-9]*[가-힣][가-힣0-9]*|[A-Za-z0-9]+(?:[._\-:/][A-Za-z0-9]+)*")
+HANGUL_PATTERN = re.compile(r"[가-힣]")
+ASCII_PART_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+
+def tokenize(text):
+    """
+    Korean-aware tokens without a morphological analyzer: every Hangul word yields itself plus
+    its character bigrams, so stems still match when particles are attached ("연차휴가의" ~ "연차");
+    ASCII identifiers are lowercased and kept whole as well as split into their parts.
+    """
+    tokens = []
+    for word in TOKEN_PATTERN.findall(text):
+        if HANGUL_PATTERN.search(word):
+            tokens.append(word)
+            if len(word) > 2:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            word = word.lower()
+            tokens.append(word)
+            parts = ASCII_PART_PATTERN.findall(word)
+            if len(parts) > 1:
+                tokens.extend(parts)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    BM25 over an inverted index stored as flat numpy arrays (CSR layout): the postings of
+    term t are doc_ids[offsets[t]:offsets[t + 1]] with matching term frequencies. Document
+    ids are FAISS row positions, so hits resolve through the same docstore as dense hits.
+    """
+
+    def __init__(self, terms, offsets, doc_ids, tfs, doc_lens, k1=1.2, b=0.75):
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+        n = len(doc_lens)
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self.avg_len = float(doc_lens.mean()) if n else 0.0
+        # Per-document length normalization of the BM25 denominator; fixed for the index.
+        self.norm = (k1 * (1 - b + b * doc_lens / self.avg_len)).astype(np.float32) if n else doc_lens
+
+    @classmethod
+    def build(cls, texts):
+        """`texts` is an iterable of (position, text)."""
+        vocab = {}
+        postings = []
+        doc_lens = {}
+        for position, text in texts:
+            counts = Counter(tokenize(text))
+            doc_lens[position] = sum(counts.values())
+            for term, tf in counts.items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((position, tf))
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in postings])
+        doc_ids = np.fromiter((position for p in postings for position, _ in p), dtype=np.int32, count=offsets[-1])
+        tfs = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=offsets[-1])
+        lens = np.zeros(max(doc_lens, default=-1) + 1, dtype=np.float32)
+        for position, length in doc_lens.items():
+            lens[position] = length
+        return cls(np.array(list(vocab), dtype=object), offsets, doc_ids, tfs, lens)
+
+    def save(self, vectorstore_dir):
+        terms = np.array(list(self.vocab), dtype=str)
+        np.savez(Path(vectorstore_dir) / LEXICAL_FILE,
+                 terms=terms, offsets=self.offsets, doc_ids=self.doc_ids, tfs=self.tfs, doc_lens=self.doc_lens)
+
+    @classmethod
+    def load(cls, vectorstore_dir):
+        path = Path(vectorstore_dir) / LEXICAL_FILE
+        if not path.is_file():
+            return None
+        with np.load(path) as data:
+            return cls(data["terms"].tolist(), data["offsets"], data["doc_ids"], data["tfs"], data["doc_lens"])
+
+    def search(self, query, k, mask=None):
+        """Top-k (position, bm25 score) pairs, best first; `mask` restricts the hits to rows where it is True."""
+        term_ids = [self.vocab[term] for term in set(tokenize(query)) if term in self.vocab]
+        if not term_ids:
+            return []
+        scores = np.zeros(len(self.doc_lens), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs, tfs = self.doc_ids[start:end], self.tfs[start:end]
+            scores[docs] += self.idf[term_id] * tfs * (self.k1 + 1) / (tfs + self.norm[docs])
+        if mask is not None:
+            scores[~mask[:len(scores)]] = 0
+        k = min(k, int(np.count_nonzero(scores)))
+        top = np.argpartition(-scores, k - 1)[:k] if k else []
+        return sorted(((int(i), float(scores[i])) for i in top), key=lambda hit: -hit[1])
+
+
+def reciprocal_rank_fusion(rankings, k, c=60):
+    """Merge best-first (position, score) lists by sum of 1 / (c + rank)."""
+    fused = Counter()
+    for ranking in rankings:
+        for rank, (position, _) in enumerate(ranking, start=1):
+            fused[position] += 1 / (c + rank)
+    return fused.most_common(k)
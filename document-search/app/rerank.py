@@ -0,0 +1,42 @@
+import math
+import time
+
+
+class Reranker:
+    """
+    Re-orders retrieved candidates by cross-encoder relevance. All (query, candidate) pairs of a
+    call are scored in small batches, query by query, and the budget is checked after every batch;
+    queries whose candidates were not all scored within it keep their retrieval order.
+    """
+
+    def __init__(self, model_name, batch_size=8, max_length=512):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu", max_length=max_length)
+        self.batch_size = batch_size
+
+    def rerank(self, queries, candidates, k, budget_ms=0):
+        """
+        `candidates` holds best-first (document, score) lists per query. Returns per query the
+        top-k (document, score) list and whether it was re-ranked, plus the elapsed milliseconds.
+        """
+        started = time.perf_counter()
+        deadline = started + budget_ms / 1000 if budget_ms > 0 else math.inf
+        pairs = [(query, document.page_content) for query, hits in zip(queries, candidates) for document, _ in hits]
+        scores = []
+        for start in range(0, len(pairs), self.batch_size):
+            batch = [float(score) for score in self.model.predict(pairs[start:start + self.batch_size])]
+            # Scores that arrive past the deadline are dropped, so a slow batch cannot stretch the budget.
+            if time.perf_counter() > deadline:
+                break
+            scores.extend(batch)
+        results = []
+        offset = 0
+        for hits in candidates:
+            hit_scores = scores[offset:offset + len(hits)]
+            offset += len(hits)
+            if len(hit_scores) < len(hits):
+                results.append((hits[:k], False))
+                continue
+            ranked = sorted(zip(hit_scores, range(len(hits))), key=lambda pair: pair[0], reverse=True)
+            results.append(([(hits[i][0], score) for score, i in ranked[:k]], True))
+        return results, (time.perf_counter() - started) * 1000
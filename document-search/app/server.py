@@ -1,50 +1,573 @@
+import asyncio
+import collections
 import grpc
 from concurrent import futures
+import hashlib
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import sys
+import threading
 import time
+from pathlib import Path
 
+import faiss
+import numpy as np
+from app.batching import MicroBatcher
+from app.cache import LRUCache, normalize_query
+from app.docstore import load_manifest, load_store, snapshot_dir
+from app.embeddings import EMBEDDING_BACKEND, EMBEDDING_MODEL, embedding_id, make_embeddings
+from app.filters import MetadataIndex, parse_filters
+from app.lexical import LexicalIndex, reciprocal_rank_fusion
+from app.rerank import Reranker
+from app import index as faiss_index
 from app.proto import document_search_pb2
 from app.proto import document_search_pb2_grpc
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 import logging
 logging.basicConfig(level=logging.INFO)
 
-EMBEDDING_MODEL = "jhgan/ko-sbert-nli"
+VECTORSTORE_DIR = "vectorstore"
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 10000))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 10000))
+CACHE_STATS_LOG_INTERVAL = 1000
+# "thread": one request per executor thread. "aio": asyncio server with micro-batched embedding.
+SERVER_MODE = os.environ.get("SERVER_MODE", "thread")
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 32))
+MAX_BATCH_WAIT_MS = float(os.environ.get("MAX_BATCH_WAIT_MS", 5))
+# Server processes sharing the port; >1 forks them from one parent that has loaded the model and index.
+WORKERS = int(os.environ.get("WORKERS", 1))
+# torch/OpenMP threads per worker; defaults to an even share of the host's cores.
+THREADS_PER_WORKER = int(os.environ.get("THREADS_PER_WORKER", 0)) or max((os.cpu_count() or 1) // WORKERS, 1)
+# Candidates taken from each retriever before reciprocal rank fusion in HYBRID mode.
+HYBRID_CANDIDATES = 50
+# Cross-encoder for requests with rerank set; empty disables re-ranking.
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "")
+# Candidates over-fetched for the cross-encoder, and its default per-request time budget.
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", 20))
+RERANK_BUDGET_MS = int(os.environ.get("RERANK_BUDGET_MS", 200))
+# Seconds between checks of VECTORSTORE_DIR for a rebuilt snapshot; 0 disables the watcher.
+RELOAD_POLL_SECONDS = float(os.environ.get("RELOAD_POLL_SECONDS", 10))
+# Seconds a stopping server lets in-flight requests finish, e.g. a worker replaced after a reload.
+STOP_GRACE_SECONDS = 5
+
+
+def vectorstore_version(path):
+    """Fingerprint of the published snapshot's files; changes whenever the vectorstore is rebuilt."""
+    digest = hashlib.sha1()
+    for file in sorted(snapshot_dir(path).iterdir()):
+        if not file.is_file():
+            continue
+        stat = file.stat()
+        digest.update(f"{file.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+
+def limit_threads(threads):
+    """Cap the torch and FAISS (OpenMP) thread pools of this process."""
+    import torch
+    torch.set_num_threads(threads)
+    faiss.omp_set_num_threads(threads)
+    os.environ["OMP_NUM_THREADS"] = str(threads)  # sizes ONNX Runtime sessions created afterwards
+
+
+# One loaded vectorstore. Requests read the service's snapshot once, so a reload swapping in a new
+# one never mixes an old index with a new docstore mid-request.
+Snapshot = collections.namedtuple("Snapshot", ["version", "index", "docstore", "lexical", "metadata"])
+
+# Per-request search settings. Part of the result cache key and of the micro-batch grouping.
+SearchOptions = collections.namedtuple(
+    "SearchOptions", ["nprobe", "ef_search", "mode", "rerank", "rerank_budget_ms", "filters"],
+    defaults=[0, 0, document_search_pb2.DENSE, False, 0, ()],
+)
+
+# Answer to one query: the snapshot version and best-first (document, score) hits.
+SearchResult = collections.namedtuple("SearchResult", ["version", "hits", "reranked", "rerank_ms"], defaults=[False, 0.0])
+
+
+class RequestError(Exception):
+    """A request that cannot be served, with the gRPC status code it is aborted with."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def request_k(request):
+    """Results per query; 3 when the request leaves k unset."""
+    if not request.HasField("k"):
+        return 3
+    if request.k <= 0:
+        raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, f"k must be positive, got {request.k}")
+    return request.k
+
+
+def search_options(request):
+    try:
+        filters = parse_filters(request.filters, from_metadata_value)
+    except ValueError as e:
+        raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, f"invalid filters: {e}") from None
+    return SearchOptions(
+        nprobe=request.nprobe, ef_search=request.ef_search, mode=request.mode, rerank=request.rerank,
+        rerank_budget_ms=request.rerank_budget_ms if request.HasField("rerank_budget_ms") else RERANK_BUDGET_MS,
+        filters=filters,
+    )
+
+
+RESPONSE_FIELDS = frozenset(["id", "content", "score", "source", "metadata"])
+
+
+def to_metadata_value(value):
+    if isinstance(value, bool):
+        return document_search_pb2.MetadataValue(bool_value=value)
+    if isinstance(value, int):
+        return document_search_pb2.MetadataValue(int_value=value)
+    if isinstance(value, float):
+        return document_search_pb2.MetadataValue(double_value=value)
+    return document_search_pb2.MetadataValue(string_value=str(value))
+
+
+def from_metadata_value(value):
+    return getattr(value, value.WhichOneof("kind"))
+
+
+def requested_fields(request):
+    return frozenset(request.fields.paths) or RESPONSE_FIELDS
+
+
+def to_response(document, score, result, query_index=0, fields=RESPONSE_FIELDS):
+    response = document_search_pb2.DocumentSearchResponse(
+        query_index=query_index, index_version=result.version, reranked=result.reranked, rerank_ms=result.rerank_ms
+    )
+    if "id" in fields and document.id:
+        response.id = document.id
+    if "content" in fields:
+        response.content = document.page_content
+    if "score" in fields:
+        response.score = float(score)
+    if "source" in fields:
+        response.source = document.metadata.get("source", "")
+    if "metadata" in fields:
+        for key, value in document.metadata.items():
+            if key != "source":
+                response.metadata[key].CopyFrom(to_metadata_value(value))
+    return response
 
 
 class DocumentSearchService(document_search_pb2_grpc.DocumentSearchServiceServicer):
     def __init__(self):
         self.model_name = EMBEDDING_MODEL
-        self.embeddings = HuggingFaceEmbeddings(model_name=self.model_name)
-        logging.info("embeddings loaded.")
-        self.vectorstore = FAISS.load_local("vectorstore", self.embeddings, allow_dangerous_deserialization=True)
-        logging.info("vectorstore loaded.")
+        self.embeddings = make_embeddings()
+        logging.info(f"embeddings loaded. (backend={EMBEDDING_BACKEND})")
+        self.embedding_cache = LRUCache(EMBEDDING_CACHE_SIZE)
+        self.result_cache = LRUCache(RESULT_CACHE_SIZE)
+        self.reranker = Reranker(RERANK_MODEL) if RERANK_MODEL else None
+        if self.reranker:
+            logging.info(f"reranker loaded. (model={RERANK_MODEL})")
+        self._reload_lock = threading.Lock()
+        # Set in prefork workers: reloads are done by this parent process, which then replaces the workers.
+        self.reload_parent = None
+        self.snapshot = self.load_snapshot(VECTORSTORE_DIR)
+        logging.info(f"vectorstore loaded. (version={self.snapshot.version})")
+        self._requests = 0
+
+    def load_snapshot(self, path):
+        # Every file is read from the one build `current` points at now, even if it is repointed meanwhile.
+        path = snapshot_dir(path)
+        version = vectorstore_version(path)
+        index, docstore = load_store(path)
+        lexical = LexicalIndex.load(path)
+        if lexical is None:
+            logging.warning("vectorstore has no lexical index, SPARSE and HYBRID requests fall back to DENSE.")
+        metadata = MetadataIndex.load(path)
+        if metadata is None:
+            logging.warning("vectorstore has no metadata index, filtered requests are rejected.")
+        snapshot = Snapshot(version, index, docstore, lexical, metadata)
+        self.validate(snapshot, path)
+        return snapshot
+
+    def validate(self, snapshot, path):
+        """Reject a snapshot that is half-written or was built with another embedding model."""
+        built_with = load_manifest(path).get("embeddings")
+        if built_with and built_with != embedding_id():
+            raise ValueError(f"vectorstore was built with {built_with} but the server embeds with {embedding_id()}")
+        if snapshot.index.ntotal != len(snapshot.docstore):
+            raise ValueError(f"index has {snapshot.index.ntotal} vectors but docstore {len(snapshot.docstore)} chunks")
+        if snapshot.metadata is not None and snapshot.metadata.size != snapshot.index.ntotal:
+            raise ValueError(f"index has {snapshot.index.ntotal} vectors but metadata index {snapshot.metadata.size} rows")
+        probe = self.embed_queries(["probe"])
+        if probe.shape[1] != snapshot.index.d:
+            raise ValueError(f"index dimension {snapshot.index.d} does not match the model's {probe.shape[1]}")
+        if snapshot.index.ntotal:
+            self.fetch(snapshot, self.search_by_vectors(snapshot, probe, 1, SearchOptions()))
+
+    def reload(self, path=VECTORSTORE_DIR):
+        """
+        Load and validate the vectorstore at `path` next to the one being served, then swap it in.
+        In-flight requests finish on the snapshot they started with. Returns False if `path` holds
+        the snapshot already served.
+        """
+        with self._reload_lock:
+            if vectorstore_version(path) == self.snapshot.version:
+                return False
+            snapshot = self.load_snapshot(path)
+            self.snapshot = snapshot
+            # Results of the previous snapshot are stale; embeddings only depend on the model and survive.
+            self.result_cache.clear()
+            logging.info(f"vectorstore reloaded. (version={snapshot.version})")
+            return True
+
+    def poll(self, seen, path=VECTORSTORE_DIR):
+        """
+        One watcher check: reload `path` if its fingerprint differs from the served snapshot and
+        equals `seen`, the one of the previous check, so a build still being written is skipped.
+        Returns (fingerprint to pass as `seen` next time, whether a snapshot was loaded).
+        """
+        try:
+            version = vectorstore_version(path)
+            if version != seen or version == self.snapshot.version:
+                return version, False
+            return version, self.reload(path)
+        except Exception:
+            logging.exception("vectorstore reload failed, keeping the current snapshot.")
+            return seen, False
+
+    def watch(self, path=VECTORSTORE_DIR, interval=RELOAD_POLL_SECONDS):
+        """Reload `path` whenever its fingerprint changes and then stays unchanged for one more poll."""
+        def run():
+            seen = self.snapshot.version
+            while True:
+                time.sleep(interval)
+                seen, _ = self.poll(seen, path)
+
+        threading.Thread(target=run, name="vectorstore-watcher", daemon=True).start()
+
+    def request_reload(self, path):
+        """
+        ReloadVectorstore: reload in this process, or in a prefork worker ask the parent to reload
+        and replace every worker, so all workers serve the same snapshot. The worker answers right
+        away with whether a newer snapshot is on disk and the version it still serves.
+        """
+        if self.reload_parent is None:
+            return self.reload(path)
+        if path != VECTORSTORE_DIR:
+            raise ValueError(f"prefork workers only reload {VECTORSTORE_DIR}")
+        os.kill(self.reload_parent, signal.SIGHUP)
+        return vectorstore_version(path) != self.snapshot.version
+
+    def embed_queries(self, queries):
+        vectors = [self.embedding_cache.get(query) for query in queries]
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            # All cache misses go through the model in a single batched forward pass.
+            embedded = self.embeddings.embed_documents([queries[i] for i in misses])
+            for i, vector in zip(misses, embedded):
+                vectors[i] = np.asarray(vector, dtype=np.float32)
+                self.embedding_cache.put(queries[i], vectors[i])
+        return np.stack(vectors)
+
+    def check_filters(self, snapshot, options):
+        if options.filters and snapshot.metadata is None:
+            raise RequestError(
+                grpc.StatusCode.FAILED_PRECONDITION, "vectorstore has no metadata index; rebuild it to use filters"
+            )
+
+    def request_options(self, request):
+        """SearchOptions of a request, checked against the current snapshot before it is searched or queued."""
+        options = search_options(request)
+        self.check_filters(self.snapshot, options)
+        return options
+
+    def search_by_vectors(self, snapshot, vectors, k, options):
+        """Dense best-first (position, distance) lists from one FAISS search over the (n_queries, dim) matrix."""
+        self.check_filters(snapshot, options)
+        scores, indices = faiss_index.search(
+            snapshot.index, np.asarray(vectors, dtype=np.float32), k,
+            nprobe=options.nprobe, ef_search=options.ef_search,
+            selector=snapshot.metadata.selector(options.filters) if options.filters else None,
+            selected=snapshot.metadata.count(options.filters) if options.filters else None,
+        )
+        return [
+            [(int(i), float(score)) for score, i in zip(row_scores, row) if i != -1]
+            for row_scores, row in zip(scores, indices)
+        ]
+
+    def retrieval_mode(self, snapshot, options):
+        return options.mode if snapshot.lexical is not None else document_search_pb2.DENSE
+
+    def retrieve(self, snapshot, queries, vectors, k, options):
+        """Best-first (position, score) lists per query for the retrieval mode of `options`."""
+        mode = self.retrieval_mode(snapshot, options)
+        if mode == document_search_pb2.SPARSE:
+            self.check_filters(snapshot, options)
+            mask = snapshot.metadata.mask(options.filters) if options.filters else None
+            return [snapshot.lexical.search(query, k, mask) for query in queries]
+        if mode == document_search_pb2.DENSE:
+            return self.search_by_vectors(snapshot, vectors, k, options)
+        depth = max(k, HYBRID_CANDIDATES)
+        dense = self.search_by_vectors(snapshot, vectors, depth, options)
+        mask = snapshot.metadata.mask(options.filters) if options.filters else None
+        return [
+            reciprocal_rank_fusion([ranking, snapshot.lexical.search(query, depth, mask)], k)
+            for query, ranking in zip(queries, dense)
+        ]
+
+    def fetch(self, snapshot, rankings):
+        # Fetch the text of every hit of every query in one docstore lookup.
+        documents = snapshot.docstore.get({position for ranking in rankings for position, _ in ranking})
+        return [[(documents[position], score) for position, score in ranking] for ranking in rankings]
+
+    def search_batch(self, items):
+        """
+        Answer a list of (query, k, SearchOptions) lookups with at most one model call
+        and one FAISS search per distinct SearchOptions. Returns a SearchResult per item, or the
+        exception its SearchOptions group failed with, so one bad request fails only its own group.
+        """
+        snapshot = self.snapshot
+        version = snapshot.version
+        items = [(normalize_query(query), k, options) for query, k, options in items]
+        results = [self.result_cache.get((version, *item)) for item in items]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            # SPARSE lookups need no embedding.
+            dense = [i for i in misses if self.retrieval_mode(snapshot, items[i][2]) != document_search_pb2.SPARSE]
+            vectors = dict(zip(dense, self.embed_queries([items[i][0] for i in dense]))) if dense else {}
+            groups = collections.defaultdict(list)
+            for i in misses:
+                groups[items[i][2]].append(i)
+            for options, group in groups.items():
+                try:
+                    self.search_group(snapshot, items, group, vectors, options, results)
+                except Exception as e:
+                    if not isinstance(e, RequestError):
+                        logging.exception(f"search failed. (options={options})")
+                    for i in group:
+                        results[i] = e
+        self._log_cache_stats()
+        return results
+
+    def search_group(self, snapshot, items, group, vectors, options, results):
+        """Fill `results` for the items at the `group` positions, which share `options`."""
+        version = snapshot.version
+        max_k = max(items[i][1] for i in group)
+        queries = [items[i][0] for i in group]
+        group_vectors = np.stack([vectors[i] for i in group]) if group[0] in vectors else None
+        rerank = options.rerank and self.reranker is not None
+        depth = max(max_k, RERANK_CANDIDATES) if rerank else max_k
+        candidates = self.fetch(snapshot, self.retrieve(snapshot, queries, group_vectors, depth, options))
+        if not rerank:
+            for i, hits in zip(group, candidates):
+                results[i] = SearchResult(version, hits[:items[i][1]])
+                self.result_cache.put((version, *items[i]), results[i])
+            return
+        reranked, rerank_ms = self.reranker.rerank(queries, candidates, max_k, options.rerank_budget_ms)
+        for i, (hits, ok) in zip(group, reranked):
+            results[i] = SearchResult(version, hits[:items[i][1]], ok, rerank_ms)
+            # A fallback to vector order is not cached, so the next request tries the cross-encoder again.
+            if ok:
+                self.result_cache.put((version, *items[i]), results[i]._replace(rerank_ms=0.0))
+
+    def search(self, queries, k, options=SearchOptions()):
+        results = self.search_batch([(query, k, options) for query in queries])
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def cache_stats(self):
+        return dict(version=self.snapshot.version, embedding=self.embedding_cache.stats(), result=self.result_cache.stats())
+
+    def _log_cache_stats(self):
+        self._requests += 1
+        if self._requests % CACHE_STATS_LOG_INTERVAL == 0:
+            logging.info(f"cache stats: {self.cache_stats()}")
 
     def RetrieveDocuments(self, request, context):
-        query = request.query
-        k = request.k or 3
-        retriever = self.vectorstore.as_retriever(search_kwargs={"k": k})
-        for document in retriever.invoke(query):
-            response = document_search_pb2.DocumentSearchResponse()
-            response.payload.update(dict(
-                id=document.id,
-                content=document.page_content,
-                metadata=document.metadata
-            ))
-            yield response
-
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    document_search_pb2_grpc.add_DocumentSearchServiceServicer_to_server(DocumentSearchService(), server)
+        fields = requested_fields(request)
+        try:
+            result = self.search([request.query], request_k(request), self.request_options(request))[0]
+        except RequestError as e:
+            context.abort(e.code, str(e))
+        for document, score in result.hits:
+            yield to_response(document, score, result, fields=fields)
+
+    def RetrieveDocumentsBatch(self, request, context):
+        queries = list(request.queries)
+        if not queries:
+            return
+        fields = requested_fields(request)
+        try:
+            results = self.search(queries, request_k(request), self.request_options(request))
+        except RequestError as e:
+            context.abort(e.code, str(e))
+        for query_index, result in enumerate(results):
+            for document, score in result.hits:
+                yield to_response(document, score, result, query_index, fields)
+
+    def ReloadVectorstore(self, request, context):
+        try:
+            reloaded = self.request_reload(request.path or VECTORSTORE_DIR)
+        except Exception as e:
+            logging.exception("vectorstore reload failed, keeping the current snapshot.")
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"reload failed: {e}")
+        return document_search_pb2.ReloadVectorstoreResponse(reloaded=reloaded, index_version=self.snapshot.version)
+
+class AsyncDocumentSearchService(document_search_pb2_grpc.DocumentSearchServiceServicer):
+    """grpc.aio servicer that routes every query through a shared MicroBatcher."""
+
+    def __init__(self, service, batcher):
+        self.service = service
+        self.batcher = batcher
+
+    async def RetrieveDocuments(self, request, context):
+        fields = requested_fields(request)
+        try:
+            result = await self.batcher.submit(request.query, request_k(request), self.service.request_options(request))
+        except RequestError as e:
+            await context.abort(e.code, str(e))
+        for document, score in result.hits:
+            yield to_response(document, score, result, fields=fields)
+
+    async def RetrieveDocumentsBatch(self, request, context):
+        fields = requested_fields(request)
+        try:
+            k = request_k(request)
+            options = self.service.request_options(request)
+            results = await asyncio.gather(*(self.batcher.submit(query, k, options) for query in request.queries))
+        except RequestError as e:
+            await context.abort(e.code, str(e))
+        for query_index, result in enumerate(results):
+            for document, score in result.hits:
+                yield to_response(document, score, result, query_index, fields)
+
+    async def ReloadVectorstore(self, request, context):
+        # Loading runs on a worker thread; the event loop keeps serving the current snapshot.
+        try:
+            reloaded = await asyncio.get_running_loop().run_in_executor(
+                None, self.service.request_reload, request.path or VECTORSTORE_DIR
+            )
+        except Exception as e:
+            logging.exception("vectorstore reload failed, keeping the current snapshot.")
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"reload failed: {e}")
+        return document_search_pb2.ReloadVectorstoreResponse(reloaded=reloaded, index_version=self.service.snapshot.version)
+
+
+async def serve_async(service=None, watch=True):
+    service = service or DocumentSearchService()
+    if watch and RELOAD_POLL_SECONDS > 0:
+        service.watch()
+    batcher = MicroBatcher(service.search_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS)
+    server = grpc.aio.server(options=[("grpc.so_reuseport", 1)])
+    document_search_pb2_grpc.add_DocumentSearchServiceServicer_to_server(AsyncDocumentSearchService(service, batcher), server)
+    server.add_insecure_port('[::]:50051')
+    await server.start()
+    batcher.start()
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    logging.info(f"aio server started. (max_batch_size={MAX_BATCH_SIZE}, max_batch_wait_ms={MAX_BATCH_WAIT_MS})")
+    try:
+        await stopping.wait()
+    finally:
+        await server.stop(STOP_GRACE_SECONDS)
+        await batcher.stop()
+
+
+def serve(service=None, watch=True):
+    service = service or DocumentSearchService()
+    if watch and RELOAD_POLL_SECONDS > 0:
+        service.watch()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10), options=[("grpc.so_reuseport", 1)])
+    document_search_pb2_grpc.add_DocumentSearchServiceServicer_to_server(service, server)
     server.add_insecure_port('[::]:50051')
     server.start()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     logging.info("server started.")
     try:
         while True:
             time.sleep(86400)
-    except KeyboardInterrupt:
-        server.stop(0)
+    except (KeyboardInterrupt, SystemExit):
+        server.stop(STOP_GRACE_SECONDS).wait()
+
+
+def run_worker(service, parent):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent stops the workers
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)  # meant for the parent
+    limit_threads(THREADS_PER_WORKER)
+    service.reload_parent = parent
+    if SERVER_MODE == "aio":
+        asyncio.run(serve_async(service, watch=False))
+    else:
+        serve(service, watch=False)
+
+
+def serve_prefork():
+    """
+    Fork WORKERS server processes that all bind port 50051 with SO_REUSEPORT, so the kernel
+    spreads connections across them. The model and index are loaded once in the parent before
+    forking and shared copy-on-write; the parent creates no gRPC objects, which must not cross a
+    fork. Workers that exit are replaced.
+
+    Only the parent watches the vectorstore (and reloads on a worker's ReloadVectorstore, sent as
+    SIGHUP). After loading a new snapshot it replaces the workers one at a time, so they keep
+    sharing pages and serve a single index_version once the replacement is done.
+    """
+    # Load with a single thread so no OpenMP pool exists in the parent at fork time.
+    limit_threads(1)
+    service = DocumentSearchService()
+    context = multiprocessing.get_context("fork")
+
+    def start(i):
+        worker = context.Process(target=run_worker, args=(service, os.getpid()), name=f"worker-{i}", daemon=True)
+        worker.start()
+        return worker
+
+    def replace_workers():
+        # SO_REUSEPORT lets the new worker bind before the old one stops taking connections.
+        for i, old in list(workers.items()):
+            workers[i] = start(i)
+            time.sleep(1)
+            old.terminate()  # SIGTERM: stops accepting and finishes in-flight requests
+            old.join()
+        logging.info(f"workers replaced. (version={service.snapshot.version})")
+
+    reload_requested = threading.Event()
+    workers = {i: start(i) for i in range(WORKERS)}
+    logging.info(f"prefork server started. (workers={WORKERS}, threads_per_worker={THREADS_PER_WORKER})")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    signal.signal(signal.SIGHUP, lambda *_: reload_requested.set())
+    seen = service.snapshot.version
+    next_poll = time.monotonic() + RELOAD_POLL_SECONDS
+    try:
+        while True:
+            # Wake up at least every second to act on a SIGHUP.
+            multiprocessing.connection.wait([worker.sentinel for worker in workers.values()], timeout=1)
+            for i, worker in list(workers.items()):
+                if not worker.is_alive():
+                    logging.warning(f"{worker.name} exited with code {worker.exitcode}, restarting.")
+                    workers[i] = start(i)
+            reloaded = False
+            if reload_requested.is_set():
+                reload_requested.clear()
+                try:
+                    reloaded = service.reload()
+                except Exception:
+                    logging.exception("vectorstore reload failed, keeping the current snapshot.")
+            elif RELOAD_POLL_SECONDS > 0 and time.monotonic() >= next_poll:
+                next_poll = time.monotonic() + RELOAD_POLL_SECONDS
+                seen, reloaded = service.poll(seen)
+            if reloaded:
+                replace_workers()
+    except (KeyboardInterrupt, SystemExit):
+        for worker in workers.values():
+            worker.terminate()
+        for worker in workers.values():
+            worker.join()
 
 
 if __name__ == '__main__':
-    serve()
+    if WORKERS > 1:
+        serve_prefork()
+    elif SERVER_MODE == "aio":
+        asyncio.run(serve_async())
+    else:
+        serve()
@@ -1,20 +1,285 @@
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_community.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 
+from app.docstore import (
+    CURRENT_LINK, DOCSTORE_FILE, INDEX_FILE, MANIFEST_FILE, PICKLE_FILE, VERSIONS_DIR, DocstoreWriter, load_manifest, snapshot_dir,
+)
+from app.embeddings import EMBEDDING_BACKEND, EMBEDDING_BACKENDS, embedding_id, make_embeddings
+from app.index import INDEX_PRESETS, index_description, make_index, supports_remove
+from app.filters import MetadataIndex
+from app.lexical import LexicalIndex
 
-loader = DirectoryLoader("dataset", glob="**/*.txt", loader_cls=TextLoader, loader_kwargs={"encoding": "utf-8"})
-documents = loader.load()
+logging.basicConfig(level=logging.INFO)
 
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-chunks = text_splitter.split_documents(documents)
+DATASET_DIR = "dataset"
+DATASET_GLOB = "**/*.txt"
+VECTORSTORE_DIR = "vectorstore"
+STAGING_DIR = ".staging"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+BATCH_SIZE = 256
+TRAIN_SIZE = 65536
+# Published builds kept under versions/; older ones are deleted, servers that still serve one keep their open files.
+KEEP_VERSIONS = 2
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_manifest(vectorstore_dir, index, embeddings, files):
+    with open(Path(vectorstore_dir) / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(dict(index=index, embeddings=embeddings, files=files), f, ensure_ascii=False, indent=2)
+
+
+def split_file(source, sha256):
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks = text_splitter.split_documents(TextLoader(source, encoding="utf-8").load())
+    # Chunk ids derive from the path and content hash, so an unchanged file always maps to the same ids.
+    prefix = hashlib.sha256(f"{source}:{sha256}".encode()).hexdigest()[:16]
+    return source, sha256, [(f"{prefix}-{i}", chunk) for i, chunk in enumerate(chunks)]
+
+
+_embeddings = None
+
+
+def _init_worker(threads, backend):
+    global _embeddings
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    if backend == "torch":
+        # Only the torch backend needs torch; the ONNX ones must not pay for importing it.
+        import torch
+        torch.set_num_threads(threads)
+    _embeddings = make_embeddings(backend)
+
+
+def _embed_batch(texts):
+    return np.asarray(_embeddings.embed_documents(texts), dtype=np.float32)
+
+
+def bounded_map(pool, fn, iterable, max_in_flight):
+    """Like pool.map, but keeps at most `max_in_flight` tasks (and their results) in memory."""
+    pending = deque()
+    for args in iterable:
+        pending.append(pool.submit(fn, *args))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def embed_batches(pool, batches, max_in_flight):
+    """Embed chunk batches on `pool`, yielding (batch, vectors) in submission order."""
+    pending = deque()
+    for batch in batches:
+        pending.append((batch, pool.submit(_embed_batch, [chunk.page_content for _, chunk in batch])))
+        if len(pending) >= max_in_flight:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+    while pending:
+        batch, future = pending.popleft()
+        yield batch, future.result()
+
+
+def iter_batches(split_files, batch_size, manifest):
+    """Regroup per-file chunks into fixed-size batches, recording each file's chunk ids in `manifest`."""
+    batch = []
+    for source, sha256, chunks in split_files:
+        manifest[source] = dict(sha256=sha256, ids=[_id for _id, _ in chunks])
+        for item in chunks:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def add_batch(index, docstore, batch, vectors):
+    # Chunks are stored at the row positions their vectors get.
+    docstore.add(index.ntotal, batch)
+    index.add(vectors)
+
+
+def train_and_add(index, docstore, buffered):
+    vectors = np.concatenate([vectors for _, vectors in buffered])
+    logging.info(f"training index on {len(vectors)} vectors.")
+    index.train(vectors)
+    for batch, vectors in buffered:
+        add_batch(index, docstore, batch, vectors)
+
+
+def publish(staging_dir, vectorstore_dir):
+    """
+    Publish a finished build as a new snapshot and switch to it in one step.
+
+    The staging directory becomes versions/<build>, then a fresh `current` symlink replaces the
+    old one with a single os.replace, so a server resolving `current` loads one whole build or the
+    other, never files of both. No file is replaced in place.
+    """
+    root = Path(vectorstore_dir)
+    versions = root / VERSIONS_DIR
+    versions.mkdir(exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    os.rename(staging_dir, versions / name)
+    link = root / f"{CURRENT_LINK}.tmp"
+    link.unlink(missing_ok=True)
+    link.symlink_to(Path(VERSIONS_DIR) / name, target_is_directory=True)
+    os.replace(link, root / CURRENT_LINK)
+    # Files of a vectorstore built before builds were versioned.
+    for path in [*(versions / name).iterdir(), Path(PICKLE_FILE)]:
+        (root / path.name).unlink(missing_ok=True)
+    for old in sorted(versions.iterdir())[:-KEEP_VERSIONS]:
+        shutil.rmtree(old)
+
+
+def build(dataset_dir=DATASET_DIR, vectorstore_dir=VECTORSTORE_DIR, full=False, workers=1, batch_size=BATCH_SIZE,
+          index="Flat", train_size=TRAIN_SIZE, backend=EMBEDDING_BACKEND):
+    """
+    Sync the saved vectorstore with the dataset.
+
+    The manifest keeps the sha256 and chunk ids of every indexed file, so only new or changed
+    files are split and embedded and the chunks of changed or removed files are deleted.
+    `full=True` ignores the existing vectorstore and re-embeds everything.
+
+    Files stream through a process pool for chunking and fixed-size chunk batches through
+    `workers` embedding processes, which alone load the model. Vectors are appended to the index
+    and chunks written to the staged docstore.sqlite as batches complete, so besides the index
+    (and the lexical and metadata postings built at the end) only a bounded number of files and
+    batches are held in memory at any time.
+
+    `index` is a faiss.index_factory description. Indexes that need training (IVF, PQ, SQ)
+    buffer the first `train_size` vectors, train on them and then continue streaming.
+
+    `backend` selects the embedding backend; the server must run with the same one.
+    """
+    vector_index = None
+    manifest = {}
+    current = snapshot_dir(vectorstore_dir)
+    if not full and (current / INDEX_FILE).is_file():
+        vector_index = faiss.read_index(str(current / INDEX_FILE))
+        saved = load_manifest(current)
+        manifest = saved.get("files", {})
+        if not (current / DOCSTORE_FILE).is_file():
+            logging.info("vectorstore has no docstore.sqlite, falling back to a full rebuild.")
+            vector_index, manifest = None, {}
+        elif not manifest and vector_index.ntotal:
+            logging.info("vectorstore has no manifest, falling back to a full rebuild.")
+            vector_index, manifest = None, {}
+        elif saved.get("index", "Flat") != index:
+            logging.info(f"index changed from {saved.get('index', 'Flat')} to {index}, falling back to a full rebuild.")
+            vector_index, manifest = None, {}
+        elif saved.get("embeddings", embedding_id("torch")) != embedding_id(backend):
+            logging.info(f"embeddings changed to {embedding_id(backend)}, falling back to a full rebuild.")
+            vector_index, manifest = None, {}
+
+    sources = [str(path) for path in sorted(Path(dataset_dir).glob(DATASET_GLOB))]
+    stale_ids = [_id for source, entry in manifest.items() if source not in sources for _id in entry["ids"]]
+    removed = len(manifest) - sum(source in manifest for source in sources)
+    reused = 0
+    new_manifest = {}
+    changed = []
+    for source in sources:
+        sha256 = file_hash(source)
+        entry = manifest.get(source)
+        if entry and entry["sha256"] == sha256:
+            new_manifest[source] = entry
+            reused += len(entry["ids"])
+            continue
+        if entry:
+            stale_ids.extend(entry["ids"])
+        changed.append((source, sha256))
+
+    if stale_ids and not supports_remove(vector_index):
+        logging.info(f"{index} cannot delete vectors, falling back to a full rebuild.")
+        vector_index, manifest, stale_ids, reused, new_manifest = None, {}, [], 0, {}
+        changed = [(source, file_hash(source)) for source in sources]
+
+    staging_dir = Path(vectorstore_dir) / STAGING_DIR
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True)
+    docstore = DocstoreWriter(staging_dir / DOCSTORE_FILE, current / DOCSTORE_FILE if vector_index is not None else None)
+    if stale_ids:
+        # remove_ids compacts the index exactly like the docstore renumbers its rows.
+        vector_index.remove_ids(np.array(docstore.remove(stale_ids), dtype=np.int64))
+
+    embedded = 0
+    started = time.perf_counter()
+    threads = max((os.cpu_count() or 1) // workers, 1)
+    max_in_flight = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as split_pool, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads, backend)) as embed_pool:
+        split_files = bounded_map(split_pool, split_file, changed, max_in_flight)
+        batches = iter_batches(split_files, batch_size, new_manifest)
+        buffered = []
+        for batch, vectors in embed_batches(embed_pool, batches, max_in_flight):
+            embedded += len(batch)
+            elapsed = time.perf_counter() - started
+            logging.info(f"embedded {embedded} chunks ({embedded / elapsed:.1f} chunks/sec)")
+            if vector_index is None:
+                vector_index = make_index(index, vectors.shape[1])
+            if vector_index.is_trained:
+                add_batch(vector_index, docstore, batch, vectors)
+                continue
+            buffered.append((batch, vectors))
+            if sum(len(batch) for batch, _ in buffered) >= train_size:
+                train_and_add(vector_index, docstore, buffered)
+                buffered = []
+        if buffered:
+            train_and_add(vector_index, docstore, buffered)
+
+    if vector_index is None:
+        docstore.close()
+        shutil.rmtree(staging_dir)
+        logging.info(f"no documents found in {dataset_dir}.")
+        return
+    faiss.write_index(vector_index, str(staging_dir / INDEX_FILE))
+    LexicalIndex.build((position, content) for position, content, _ in docstore.rows()).save(staging_dir)
+    MetadataIndex.build(
+        ((position, metadata) for position, _, metadata in docstore.rows()), vector_index.ntotal
+    ).save(staging_dir)
+    docstore.close()
+    save_manifest(staging_dir, index, embedding_id(backend), new_manifest)
+    publish(staging_dir, vectorstore_dir)
+    logging.info(
+        f"vectorstore saved. files={len(sources)} removed_files={removed} "
+        f"chunks_reused={reused} chunks_embedded={embedded} chunks_deleted={len(stale_ids)}"
+    )
 
-embeddings = HuggingFaceEmbeddings(
-    model_name="jhgan/ko-sbert-nli",
-    model_kwargs={'device': 'cpu'},
-    encode_kwargs={'normalize_embeddings': True}
-)
-vectorstore = FAISS.from_documents(chunks, embeddings)
-vectorstore.save_local("vectorstore")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or incrementally update the document vectorstore.")
+    parser.add_argument("--dataset", default=DATASET_DIR)
+    parser.add_argument("--vectorstore", default=VECTORSTORE_DIR)
+    parser.add_argument("--full", action="store_true", help="re-embed every file instead of only changed ones")
+    parser.add_argument("--workers", type=int, default=1, help="chunking and embedding processes")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="chunks per embedding batch")
+    parser.add_argument("--index", default="flat",
+                        help=f"index preset ({', '.join(INDEX_PRESETS)}) or a faiss.index_factory description")
+    parser.add_argument("--nlist", type=int, default=1024, help="IVF lists; about sqrt(number of chunks)")
+    parser.add_argument("--pq-m", type=int, default=48, help="PQ sub-quantizers; must divide the embedding dimension")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW neighbours per node")
+    parser.add_argument("--train-size", type=int, default=TRAIN_SIZE, help="vectors used to train IVF/PQ/SQ indexes")
+    parser.add_argument("--embedding-backend", default=EMBEDDING_BACKEND, choices=EMBEDDING_BACKENDS,
+                        help="must match the server's EMBEDDING_BACKEND")
+    args = parser.parse_args()
+    index = index_description(args.index, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m)
+    build(args.dataset, args.vectorstore, full=args.full, workers=args.workers, batch_size=args.batch_size,
+          index=index, train_size=args.train_size, backend=args.embedding_backend)
@@ -0,0 +1,68 @@
+import argparse
+import logging
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.embeddings import EMBEDDING_BACKENDS, ONNX_MODEL_DIR, export_onnx, make_embeddings
+from build import DATASET_DIR, DATASET_GLOB, file_hash, split_file
+
+logging.basicConfig(level=logging.INFO)
+
+
+def load_texts(dataset_dir, text_file, num_texts, seed):
+    if text_file:
+        with open(text_file, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()][:num_texts]
+    texts = []
+    for path in sorted(Path(dataset_dir).glob(DATASET_GLOB)):
+        _, _, chunks = split_file(str(path), file_hash(path))
+        texts.extend(chunk.page_content for _, chunk in chunks)
+    random.Random(seed).shuffle(texts)
+    return texts[:num_texts]
+
+
+def bench(backends, texts, num_queries):
+    """Report batch throughput, single-query latency and cosine agreement with the torch backend per backend."""
+    baseline = None
+    print(f"{'backend':<10} {'sent/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'cos mean':>9} {'cos min':>9}")
+    for backend in ["torch"] + [backend for backend in backends if backend != "torch"]:
+        embeddings = make_embeddings(backend)
+        embeddings.embed_documents(texts[:8])  # warm up
+        started = time.perf_counter()
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        throughput = len(texts) / (time.perf_counter() - started)
+        latencies = []
+        for text in texts[:num_queries]:
+            started = time.perf_counter()
+            embeddings.embed_query(text)
+            latencies.append((time.perf_counter() - started) * 1000)
+        if baseline is None:
+            baseline = vectors
+        # Both sides are L2-normalized, so the row-wise dot product is the cosine similarity.
+        cosine = (vectors * baseline).sum(axis=1)
+        if backend in backends:
+            print(f"{backend:<10} {throughput:>8.1f} {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f} "
+                  f"{cosine.mean():>9.5f} {cosine.min():>9.5f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX and benchmark the embedding backends.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="export the model to ONNX with an int8-quantized copy")
+    export_parser.add_argument("--output", default=ONNX_MODEL_DIR)
+    export_parser.add_argument("--no-quantize", action="store_true", help="skip the int8 dynamic-quantized model")
+    bench_parser = commands.add_parser("bench", help="compare backends against the torch baseline")
+    bench_parser.add_argument("--backend", nargs="+", default=EMBEDDING_BACKENDS, choices=EMBEDDING_BACKENDS)
+    bench_parser.add_argument("--dataset", default=DATASET_DIR, help="chunks of these files are used as texts")
+    bench_parser.add_argument("--text-file", help="text file with one text per line, used instead of --dataset")
+    bench_parser.add_argument("--texts", type=int, default=1000, help="texts embedded for throughput and agreement")
+    bench_parser.add_argument("--queries", type=int, default=200, help="texts embedded one by one for latency")
+    args = parser.parse_args()
+    if args.command == "export":
+        export_onnx(args.output, quantize=not args.no_quantize)
+        logging.info(f"onnx model exported to {args.output}.")
+    else:
+        bench(args.backend, load_texts(args.dataset, args.text_file, args.texts, seed=0), args.queries)
@@ -0,0 +1,22 @@
+import faiss
+import numpy as np
+
+from app.filters import MetadataIndex, value_key
+from app.index import make_index, search
+
+
+def test_ivf_selective_filter_returns_k_hits():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((4000, 16)).astype(np.float32)
+    index = make_index("IVF64,Flat", 16)
+    index.train(vectors)
+    index.add(vectors)
+    faiss.extract_index_ivf(index).nprobe = 1
+    # 1% of the rows, spread over every list.
+    metadata = MetadataIndex.build(((i, {"tag": "rare" if i % 100 == 0 else "common"}) for i in range(4000)), 4000)
+    filters = (("in", "tag", (value_key("tag", "rare"),)),)
+
+    scores, indices = search(index, vectors[:8], 4, selector=metadata.selector(filters), selected=metadata.count(filters))
+
+    assert (indices != -1).sum(axis=1).tolist() == [4] * 8
+    assert all(i % 100 == 0 for i in indices.ravel())
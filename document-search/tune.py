@@ -0,0 +1,99 @@
+import argparse
+import logging
+import math
+import time
+
+import faiss
+import numpy as np
+
+from app.docstore import snapshot_dir
+from app.index import INDEX_PRESETS, index_description, make_index, search
+
+logging.basicConfig(level=logging.INFO)
+
+VECTORSTORE_DIR = "vectorstore"
+NPROBE_SWEEP = [1, 4, 16, 64]
+EF_SEARCH_SWEEP = [16, 64, 256]
+
+
+def load_vectors(vectorstore_dir):
+    """All vectors of the saved index. Exact for Flat builds; lossy indexes return their reconstructions."""
+    index = faiss.read_index(str(snapshot_dir(vectorstore_dir) / "index.faiss"))
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def load_queries(vectors, num_queries, query_file, seed):
+    if query_file:
+        from app.embeddings import make_embeddings
+        with open(query_file, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+        return np.asarray(make_embeddings().embed_documents(queries), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    return vectors[rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)]
+
+
+def sweep(index):
+    if faiss.try_extract_index_ivf(index) is not None:
+        return [dict(nprobe=nprobe) for nprobe in NPROBE_SWEEP]
+    if isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+        return [dict(ef_search=ef_search) for ef_search in EF_SEARCH_SWEEP]
+    return [dict()]
+
+
+def measure(index, queries, ground_truth, k, params):
+    _, found = search(index, queries, k, **params)
+    recall = np.mean([len(set(row) & set(truth)) / k for row, truth in zip(found, ground_truth)])
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        search(index, query[None, :], k, **params)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return recall, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def tune(vectorstore_dir, specs, k, num_queries, query_file, train_size, seed=0):
+    """Report recall@k against exact search and single-query p50/p99 latency for each index config."""
+    vectors = load_vectors(vectorstore_dir)
+    queries = load_queries(vectors, num_queries, query_file, seed)
+    n, dim = vectors.shape
+    flat = faiss.IndexFlatL2(dim)
+    flat.add(vectors)
+    _, ground_truth = flat.search(queries, k)
+    nlist = max(int(4 * math.sqrt(n)), 1)
+    logging.info(f"vectors={n} dim={dim} queries={len(queries)} k={k} nlist={nlist}")
+
+    print(f"{'index':<20} {'params':<16} {'recall@' + str(k):>9} {'p50 ms':>8} {'p99 ms':>8} {'size MB':>8} {'build s':>8}")
+    for spec in specs:
+        description = index_description(spec, nlist=nlist)
+        started = time.perf_counter()
+        try:
+            index = make_index(description, dim)
+            if not index.is_trained:
+                rng = np.random.default_rng(seed)
+                index.train(vectors[rng.choice(n, size=min(train_size, n), replace=False)])
+            index.add(vectors)
+        except RuntimeError as e:
+            logging.warning(f"skipping {description}: {e}")
+            continue
+        build_seconds = time.perf_counter() - started
+        size_mb = faiss.serialize_index(index).nbytes / 2 ** 20
+        for params in sweep(index):
+            recall, p50, p99 = measure(index, queries, ground_truth, k, params)
+            label = ",".join(f"{key}={value}" for key, value in params.items()) or "-"
+            print(f"{description:<20} {label:<16} {recall:>9.3f} {p50:>8.3f} {p99:>8.3f} {size_mb:>8.1f} {build_seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FAISS index types on the saved vectorstore.")
+    parser.add_argument("--vectorstore", default=VECTORSTORE_DIR, help="ideally built with --index flat")
+    parser.add_argument("--index", nargs="+", default=list(INDEX_PRESETS),
+                        help="index presets or faiss.index_factory descriptions to compare")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000, help="number of stored vectors sampled as queries")
+    parser.add_argument("--query-file", help="text file with one query per line, embedded instead of sampling")
+    parser.add_argument("--train-size", type=int, default=65536)
+    args = parser.parse_args()
+    tune(args.vectorstore, args.index, args.k, args.queries, args.query_file, args.train_size)
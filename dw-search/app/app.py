@@ -1,27 +1,32 @@
+import os
 import shutil
 from pathlib import Path
 
 from langchain_community.document_loaders import DirectoryLoader, TextLoader, CSVLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 
+from app.embeddings import EMBEDDING_BACKEND, EMBEDDING_MODEL, make_embeddings
+from app.columns import column_documents, parse_columns, prune_ddl, select_columns
+from app.schema_graph import SchemaGraph, table_name
+from app.values import ValueIndex, value_documents
+
 import logging
 logging.basicConfig(level=logging.INFO)
 
-EMBEDDING_MODEL = "jhgan/ko-sbert-nli"
 VECTORSTORE_DIR = "vectorstore"
+COLUMN_VECTORSTORE_DIR = "column_vectorstore"
+VALUE_VECTORSTORE_DIR = "value_vectorstore"
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "data/financial.sqlite")
 SCHEMA_FILES_DIR = "dataset/financial_db_schemas"
 
-embeddings = HuggingFaceEmbeddings(
-    model_name=EMBEDDING_MODEL,
-    model_kwargs={'device': 'cpu'},
-    encode_kwargs={'normalize_embeddings': True}
-)
-logging.info("embeddings loaded.")
+embeddings = make_embeddings()
+logging.info(f"embeddings loaded. (backend={EMBEDDING_BACKEND})")
 
 vectorstore_dir = Path(VECTORSTORE_DIR)
+column_vectorstore_dir = Path(COLUMN_VECTORSTORE_DIR)
+value_vectorstore_dir = Path(VALUE_VECTORSTORE_DIR)
 
 TABLES = [
     ("account", "Table containing customer account information."),
@@ -54,8 +59,32 @@ def reload_vectorstore():
     logging.info("vectorstore loaded.")
     return vectorstore
 
+def reload_column_vectorstore():
+    if not column_vectorstore_dir.is_dir():
+        documents = [column for document in load_documents() for column in column_documents(document)]
+        column_vectorstore = FAISS.from_documents(documents, embeddings)
+        column_vectorstore.save_local(column_vectorstore_dir)
+        logging.info("column vectorstore saved.")
+    column_vectorstore = FAISS.load_local(column_vectorstore_dir, embeddings, allow_dangerous_deserialization=True)
+    logging.info("column vectorstore loaded.")
+    return column_vectorstore
+
 vectorstore = reload_vectorstore()
 
+def reload_value_index(schema_documents):
+    if not value_vectorstore_dir.is_dir():
+        if not Path(DATABASE_PATH).is_file():
+            logging.warning(f"{DATABASE_PATH} not found, column value lookup is disabled.")
+            return None
+        table_columns = {table: parse_columns(document.page_content) for table, document in schema_documents.items()}
+        documents = list(value_documents(DATABASE_PATH, table_columns))
+        value_vectorstore = FAISS.from_documents(documents, embeddings)
+        value_vectorstore.save_local(value_vectorstore_dir)
+        logging.info(f"value vectorstore saved. (values={len(documents)})")
+    value_vectorstore = FAISS.load_local(value_vectorstore_dir, embeddings, allow_dangerous_deserialization=True)
+    logging.info("value vectorstore loaded.")
+    return ValueIndex(value_vectorstore)
+
 def retrieve_documents(query, k=3):
     retriever = vectorstore.as_retriever(search_kwargs={"k": k})
     for document in retriever.invoke(query):
@@ -63,34 +92,210 @@ def retrieve_documents(query, k=3):
 
 
 
+import collections
 import grpc
 from concurrent import futures
+import hashlib
+import threading
 import time
 
+import numpy as np
 from app.proto import document_search_pb2
 from app.proto import document_search_pb2_grpc
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+
+
+def vectorstore_version(path):
+    """Fingerprint of the saved index files; changes whenever the vectorstore is rebuilt."""
+    digest = hashlib.sha1()
+    for file in sorted(Path(path).iterdir()):
+        if not file.is_file():
+            continue
+        stat = file.stat()
+        digest.update(f"{file.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+
+# Every store one schema question is answered from, loaded and swapped together so a request never
+# mixes tables of one build with columns or values of another; `version` fingerprints all of them.
+Snapshot = collections.namedtuple(
+    "Snapshot", ["version", "vectorstore", "column_vectorstore", "schema_documents", "schema_graph", "value_index"]
+)
+
+
+def snapshot_version(path):
+    """Fingerprint of the table vectorstore at `path`, the column and value vectorstores and the schema files."""
+    dirs = [Path(path), column_vectorstore_dir, value_vectorstore_dir, Path(SCHEMA_FILES_DIR)]
+    versions = ":".join(vectorstore_version(d) if d.is_dir() else "-" for d in dirs)
+    return hashlib.sha1(versions.encode()).hexdigest()[:12]
+
+
+def load_snapshot(path, embeddings):
+    vectorstore = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    if vectorstore.index.ntotal != len(vectorstore.index_to_docstore_id):
+        raise ValueError("index and docstore sizes differ")
+    column_vectorstore = reload_column_vectorstore()
+    schema_documents = {table_name(document.page_content): document for document in load_documents()}
+    schema_graph = SchemaGraph.from_ddls(document.page_content for document in schema_documents.values())
+    value_index = reload_value_index(schema_documents)
+    # Fingerprinted last, so stores built just now are part of the version.
+    version = snapshot_version(path)
+    return Snapshot(version, vectorstore, column_vectorstore, schema_documents, schema_graph, value_index)
+
+
+# Columns retrieved per schema question before they are grouped into pruned table DDLs.
+COLUMN_CANDIDATES = 30
+SCHEMA_TOKEN_BUDGET = int(os.environ.get("SCHEMA_TOKEN_BUDGET", 1500))
+
+
+RESPONSE_FIELDS = frozenset(["id", "content", "score", "source", "metadata"])
+
+
+def to_metadata_value(value):
+    if isinstance(value, bool):
+        return document_search_pb2.MetadataValue(bool_value=value)
+    if isinstance(value, int):
+        return document_search_pb2.MetadataValue(int_value=value)
+    if isinstance(value, float):
+        return document_search_pb2.MetadataValue(double_value=value)
+    return document_search_pb2.MetadataValue(string_value=str(value))
+
+
+def requested_fields(request):
+    return frozenset(request.fields.paths) or RESPONSE_FIELDS
+
+
+def to_response(document, score, version, query_index=0, fields=RESPONSE_FIELDS):
+    response = document_search_pb2.DocumentSearchResponse(query_index=query_index, index_version=version)
+    if "id" in fields and document.id:
+        response.id = document.id
+    if "content" in fields:
+        response.content = document.page_content
+    if "score" in fields:
+        response.score = float(score)
+    if "source" in fields:
+        response.source = document.metadata.get("source", "")
+    if "metadata" in fields:
+        for key, value in document.metadata.items():
+            if key != "source":
+                response.metadata[key].CopyFrom(to_metadata_value(value))
+    return response
 
 
 class DocumentSearchService(document_search_pb2_grpc.DocumentSearchServiceServicer):
     def __init__(self):
         self.model_name = EMBEDDING_MODEL
-        self.embeddings = HuggingFaceEmbeddings(model_name=self.model_name)
-        self.vectorstore = FAISS.load_local(vectorstore_dir, self.embeddings, allow_dangerous_deserialization=True)
+        # The model that built the vectorstore, so queries are embedded exactly like the schemas.
+        self.embeddings = embeddings
+        self._reload_lock = threading.Lock()
+        self.snapshot = load_snapshot(vectorstore_dir, self.embeddings)
+
+    def reload(self, path=vectorstore_dir):
+        """
+        Load a new snapshot with the table vectorstore at `path` and swap it in with a single
+        assignment; in-flight requests finish on the snapshot they started with.
+        """
+        with self._reload_lock:
+            if snapshot_version(path) == self.snapshot.version:
+                return False
+            self.snapshot = load_snapshot(path, self.embeddings)
+            logging.info(f"snapshot reloaded. (version={self.snapshot.version})")
+            return True
+
+    def search_by_vectors(self, vectors, k):
+        # One FAISS search over the whole (n_queries, dim) matrix.
+        snapshot = self.snapshot
+        vectorstore, version = snapshot.vectorstore, snapshot.version
+        scores, indices = vectorstore.index.search(np.asarray(vectors, dtype=np.float32), k)
+        results = []
+        for row_scores, row in zip(scores, indices):
+            hits = []
+            for score, i in zip(row_scores, row):
+                if i == -1:
+                    continue
+                _id = vectorstore.index_to_docstore_id[i]
+                hits.append((vectorstore.docstore.search(_id), float(score)))
+            results.append(hits)
+        return version, results
 
     def RetrieveDocuments(self, request, context):
-        query = request.query
         k = request.k or 10
-        retriever = self.vectorstore.as_retriever(search_kwargs={"k": k})
-        for document in retriever.invoke(query):
-            response = document_search_pb2.DocumentSearchResponse()
-            response.payload.update(dict(
-                id=document.id,
-                content=document.page_content,
-                metadata=document.metadata
-            ))
-            yield response
+        fields = requested_fields(request)
+        vectors = [self.embeddings.embed_query(request.query)]
+        version, results = self.search_by_vectors(vectors, k)
+        for document, score in results[0]:
+            yield to_response(document, score, version, fields=fields)
+
+    def RetrieveDocumentsBatch(self, request, context):
+        queries = list(request.queries)
+        if not queries:
+            return
+        k = request.k or 10
+        fields = requested_fields(request)
+        # embed_documents runs all queries through the model in a single batched forward pass.
+        vectors = self.embeddings.embed_documents(queries)
+        version, results = self.search_by_vectors(vectors, k)
+        for query_index, hits in enumerate(results):
+            for document, score in hits:
+                yield to_response(document, score, version, query_index, fields)
+
+    def search_columns(self, column_vectorstore, vector, k):
+        """Best-first (column Document, distance) hits of the column index."""
+        scores, indices = column_vectorstore.index.search(np.asarray([vector], dtype=np.float32), k)
+        return [
+            (column_vectorstore.docstore.search(column_vectorstore.index_to_docstore_id[i]), float(score))
+            for score, i in zip(scores[0], indices[0]) if i != -1
+        ]
+
+    def RetrieveTableSchemas(self, request, context):
+        k = request.k or 3
+        max_tokens = request.max_tokens if request.HasField("max_tokens") else SCHEMA_TOKEN_BUDGET
+        fields = requested_fields(request)
+        snapshot = self.snapshot
+        schema_documents, schema_graph = snapshot.schema_documents, snapshot.schema_graph
+        vector = self.embeddings.embed_query(request.query)
+        hits = self.search_columns(snapshot.column_vectorstore, vector, COLUMN_CANDIDATES)
+        best = {}
+        for column, score in hits:
+            best.setdefault(column.metadata["table"], score)
+        selected = select_columns(
+            [(column.metadata["table"], column.metadata["column"]) for column, _ in hits],
+            {table: document.page_content for table, document in schema_documents.items()},
+            {table: schema_graph.key_columns(table) for table in schema_documents},
+            k, max_tokens,
+        )
+        tables = []
+        for table, columns in selected.items():
+            document = schema_documents[table]
+            pruned = Document(page_content=prune_ddl(document.page_content, columns), metadata=document.metadata)
+            tables.append(to_response(pruned, best[table], snapshot.version, fields=fields))
+        return document_search_pb2.TableSchemaResponse(
+            tables=tables,
+            joins=[document_search_pb2.JoinEdge(**edge._asdict()) for edge in schema_graph.join_path(list(selected))],
+        )
+
+    def LookupColumnValues(self, request, context):
+        value_index = self.snapshot.value_index
+        if value_index is None:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "column value index is not available")
+        matches = value_index.lookup(
+            request.query, self.embeddings.embed_query(request.query),
+            table=request.table, column=request.column, k=request.k or 10,
+        )
+        return document_search_pb2.ColumnValueResponse(values=[
+            document_search_pb2.ColumnValue(
+                table=match.table, column=match.column, value=match.value, count=match.count,
+                kind=document_search_pb2.ValueMatchKind.Value(match.kind), score=match.score,
+            )
+            for match in matches
+        ])
+
+    def ReloadVectorstore(self, request, context):
+        try:
+            reloaded = self.reload(request.path or vectorstore_dir)
+        except Exception as e:
+            logging.exception("vectorstore reload failed, keeping the current one.")
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"reload failed: {e}")
+        return document_search_pb2.ReloadVectorstoreResponse(reloaded=reloaded, index_version=self.snapshot.version)
 
 def serve():
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
@@ -0,0 +1,84 @@
+import collections
+import math
+import re
+
+from langchain_core.documents import Document
+
+from app.schema_graph import table_name
+
+# One column definition per line: name, type and an optional COMMENT '...'.
+COLUMN_LINE_PATTERN = re.compile(r"^\s*[`\"]?(\w+)[`\"]?\s+(\w+)(?:.*?\bCOMMENT\s+'((?:[^']|'')*)')?", re.IGNORECASE)
+TABLE_COMMENT_PATTERN = re.compile(r"\)\s*COMMENT\s+'((?:[^']|'')*)'", re.IGNORECASE)
+CONSTRAINT_WORDS = {"primary", "foreign", "constraint", "unique", "key", "check"}
+
+Column = collections.namedtuple("Column", ["name", "type", "comment", "line"])
+
+
+def parse_columns(ddl):
+    """Columns of a CREATE TABLE in declaration order, each with its original definition line."""
+    body = ddl[ddl.find("(") + 1:ddl.rfind(")")]
+    columns = []
+    for line in body.splitlines():
+        match = COLUMN_LINE_PATTERN.match(line)
+        if match and match.group(1).lower() not in CONSTRAINT_WORDS:
+            name, type_, comment = match.groups()
+            columns.append(Column(name, type_, (comment or "").replace("''", "'"), line.strip().rstrip(",")))
+    return columns
+
+
+def column_documents(document):
+    """One Document per column of a table schema Document, embedded on its own."""
+    table = table_name(document.page_content)
+    description = document.metadata.get("table_description", "")
+    for column in parse_columns(document.page_content):
+        yield Document(
+            page_content=f"{table}.{column.name} ({column.type}): {column.comment} | table {table}: {description}",
+            metadata=dict(source=document.metadata["source"], table=table, column=column.name),
+        )
+
+
+def prune_ddl(ddl, keep):
+    """The CREATE TABLE statement with only the columns in `keep`, in their original order."""
+    lines = [column.line for column in parse_columns(ddl) if column.name in keep]
+    comment = TABLE_COMMENT_PATTERN.search(ddl)
+    pruned = f"CREATE TABLE IF NOT EXISTS {table_name(ddl)} (\n    " + ",\n    ".join(lines) + "\n)"
+    if comment:
+        pruned += f"\nCOMMENT '{comment.group(1)}'"
+    return pruned
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English DDL; only used to stay under a budget.
+    return math.ceil(len(text) / 4)
+
+
+def select_columns(ranked_columns, ddls, key_columns, max_tables, max_tokens):
+    """
+    Pruned DDL per table for best-first (table, column) hits: tables are taken in order of their
+    best column, up to `max_tables`, each starting with its key columns; columns are then added
+    best first while the pruned DDLs fit in `max_tokens`. Returns {table: kept column names},
+    ordered by table rank.
+    """
+    selected = {}
+    tokens = 0
+    for table, column in ranked_columns:
+        if table not in ddls:
+            continue
+        if table not in selected:
+            if len(selected) == max_tables:
+                continue
+            keys = set(key_columns.get(table, ()))
+            cost = estimate_tokens(prune_ddl(ddls[table], keys | {column}))
+            if selected and tokens + cost > max_tokens:
+                continue
+            selected[table] = keys | {column}
+            tokens += cost
+            continue
+        if column in selected[table]:
+            continue
+        cost = estimate_tokens(prune_ddl(ddls[table], selected[table] | {column})) - estimate_tokens(prune_ddl(ddls[table], selected[table]))
+        if tokens + cost > max_tokens:
+            continue
+        selected[table].add(column)
+        tokens += cost
+    return selected
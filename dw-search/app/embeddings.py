@@ -0,0 +1,83 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+EMBEDDING_MODEL = "jhgan/ko-sbert-nli"
+# "torch": sentence-transformers on PyTorch. "onnx" / "onnx-int8": ONNX Runtime on the model exported by
+# document-search's `python embed.py export`. The vectorstore is built at startup with the same backend.
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+EMBEDDING_BACKENDS = ["torch", "onnx", "onnx-int8"]
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", "onnx")
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+ONNX_CONFIG_FILE = "embedding_config.json"
+
+
+class ONNXEmbeddings(Embeddings):
+    """
+    Mean-pooled, L2-normalized sentence embeddings from the ONNX export of the sentence-transformers
+    model. Texts are sorted by length before batching so that each batch pads to a similar length.
+
+    The ONNX Runtime session is created on first use in each process, so a service loaded before
+    a fork gets its own thread pool in every worker; its size follows OMP_NUM_THREADS.
+    """
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, quantized=False, batch_size=32):
+        from transformers import AutoTokenizer
+        model_dir = Path(model_dir)
+        with open(model_dir / ONNX_CONFIG_FILE, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        if config["model"] != EMBEDDING_MODEL:
+            raise ValueError(f"{model_dir} was exported from {config['model']}, not {EMBEDDING_MODEL}")
+        self.model_path = model_dir / (ONNX_INT8_FILE if quantized else ONNX_FILE)
+        self.max_seq_length = config["max_seq_length"]
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self._session = None
+        self._pid = None
+
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = int(os.environ.get("OMP_NUM_THREADS", 0))
+            self._session = onnxruntime.InferenceSession(str(self.model_path), options, providers=["CPUExecutionProvider"])
+            self._pid = os.getpid()
+        return self._session
+
+    def _embed(self, texts):
+        session = self.session()
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np")
+        feeds = {node.name: encoded[node.name].astype(np.int64) for node in session.get_inputs()}
+        hidden = session.run(None, feeds)[0]
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def make_embeddings(backend=EMBEDDING_BACKEND):
+    if backend == "torch":
+        return HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True}
+        )
+    if backend in ("onnx", "onnx-int8"):
+        return ONNXEmbeddings(quantized=backend == "onnx-int8")
+    raise ValueError(f"unknown embedding backend {backend!r}, expected one of {EMBEDDING_BACKENDS}")
@@ -0,0 +1,120 @@
+import collections
+import heapq
+import itertools
+import re
+
+TABLE_PATTERN = re.compile(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`\"]?(\w+)", re.IGNORECASE)
+COLUMN_PATTERN = re.compile(r"^\s*[`\"]?(\w+)[`\"]?\s+\w+", re.MULTILINE)
+FOREIGN_KEY_PATTERN = re.compile(r"FOREIGN\s+KEY\s*\(\s*(\w+)\s*\)\s*REFERENCES\s+[`\"]?(\w+)[`\"]?\s*\(\s*(\w+)\s*\)", re.IGNORECASE)
+INLINE_REFERENCE_PATTERN = re.compile(r"^\s*[`\"]?(\w+)[`\"]?\s+\w+[^,\n]*?\bREFERENCES\s+[`\"]?(\w+)[`\"]?\s*\(\s*(\w+)\s*\)", re.IGNORECASE | re.MULTILINE)
+CONSTRAINT_WORDS = {"primary", "foreign", "constraint", "unique", "key", "check", "create", "comment"}
+# Extra cost of a join path passing through a lookup table, which would fan out to all its rows' referencers.
+FAN_TRAP_COST = 10
+
+JoinEdge = collections.namedtuple("JoinEdge", ["left_table", "left_column", "right_table", "right_column", "inferred"])
+
+
+def table_name(ddl):
+    match = TABLE_PATTERN.search(ddl)
+    return match.group(1) if match else None
+
+
+def parse_schema(ddl):
+    """(table, columns, declared foreign keys as (column, referenced table, referenced column)) of a CREATE TABLE."""
+    body = ddl[ddl.find("(") + 1:]
+    columns = [column for column in COLUMN_PATTERN.findall(body) if column.lower() not in CONSTRAINT_WORDS]
+    inline = {key for key in INLINE_REFERENCE_PATTERN.findall(body) if key[0].lower() not in CONSTRAINT_WORDS}
+    foreign_keys = set(FOREIGN_KEY_PATTERN.findall(body)) | inline
+    return table_name(ddl), columns, sorted(foreign_keys)
+
+
+class SchemaGraph:
+    """
+    Tables as nodes and foreign keys as edges. Declared FOREIGN KEY / REFERENCES clauses are used
+    as is; in addition a column `<table>_id` is taken to reference `<table>.<table>_id`, which is
+    how the financial schemas link (loan.account_id -> account.account_id).
+    """
+
+    def __init__(self, schemas):
+        self.columns = {table: columns for table, columns, _ in schemas if table}
+        self.edges = collections.defaultdict(list)
+        seen = set()
+        for table, columns, foreign_keys in schemas:
+            declared = [(column, ref_table, ref_column, False) for column, ref_table, ref_column in foreign_keys]
+            inferred = [
+                (column, column[:-3], column, True) for column in columns
+                if column.endswith("_id") and column[:-3] != table and column in self.columns.get(column[:-3], ())
+            ]
+            for column, ref_table, ref_column, is_inferred in declared + inferred:
+                if ref_table not in self.columns or (table, column, ref_table) in seen:
+                    continue
+                seen.add((table, column, ref_table))
+                edge = JoinEdge(ref_table, ref_column, table, column, is_inferred)
+                self.edges[table].append((ref_table, edge))
+                self.edges[ref_table].append((table, edge))
+        # Referenced by other tables but referencing none, like district: dimensions, never bridges.
+        self.lookup_tables = {
+            table for table, edges in self.edges.items() if all(edge.left_table == table for _, edge in edges)
+        }
+
+    def key_columns(self, table):
+        """The table's own `<table>_id` column and every column it joins on."""
+        keys = {edge.left_column if edge.left_table == table else edge.right_column for _, edge in self.edges[table]}
+        if f"{table}_id" in self.columns.get(table, ()):
+            keys.add(f"{table}_id")
+        return keys
+
+    @classmethod
+    def from_ddls(cls, ddls):
+        return cls([parse_schema(ddl) for ddl in ddls])
+
+    def _shortest_path(self, tree, target):
+        """
+        Edges of a cheapest path from any table in `tree` to `target`. Every join costs 1, and
+        joining onward from a lookup table costs FAN_TRAP_COST more: client -> district <- account
+        pairs every client with every account of its district (a fan trap), so a bridge table
+        referencing both sides (client <- disp -> account) is taken whenever one exists.
+        """
+        counter = itertools.count()
+        cost = {table: 0 for table in tree}
+        previous = {table: None for table in tree}
+        heap = [(0, next(counter), table) for table in sorted(tree)]
+        done = set()
+        while heap:
+            table_cost, _, table = heapq.heappop(heap)
+            if table in done:
+                continue
+            done.add(table)
+            if table == target:
+                path = []
+                while previous[table] is not None:
+                    table, edge = previous[table]
+                    path.append(edge)
+                return path[::-1]
+            step = 1 + (FAN_TRAP_COST if table in self.lookup_tables else 0)
+            for neighbour, edge in self.edges[table]:
+                if neighbour not in done and table_cost + step < cost.get(neighbour, float("inf")):
+                    cost[neighbour] = table_cost + step
+                    previous[neighbour] = (table, edge)
+                    heapq.heappush(heap, (table_cost + step, next(counter), neighbour))
+        return None
+
+    def join_path(self, tables):
+        """
+        Join edges connecting `tables`: each table, in the given order, is attached to the tables
+        joined so far by a cheapest path without fan traps, so the best matches are connected first. Tables that
+        cannot be reached are left out.
+        """
+        tables = [table for table in dict.fromkeys(tables) if table in self.columns]
+        if not tables:
+            return []
+        tree = {tables[0]}
+        edges = []
+        for table in tables[1:]:
+            path = self._shortest_path(tree, table)
+            if not path:
+                continue
+            edges.extend(path)
+            for edge in path:
+                tree.update((edge.left_table, edge.right_table))
+        return edges
@@ -0,0 +1,102 @@
+import collections
+import difflib
+import sqlite3
+
+from langchain_core.documents import Document
+
+# Text columns with more distinct values than this (dates, free text, ids) are not indexed.
+MAX_DISTINCT_VALUES = 100
+TEXT_TYPES = {"STRING", "TEXT", "VARCHAR", "CHAR", "NVARCHAR", "CLOB"}
+FUZZY_THRESHOLD = 0.6
+# Containment counts as a fuzzy match only for strings this long, so "A" does not match "East Bohemia".
+MIN_CONTAINED_LENGTH = 3
+SEMANTIC_THRESHOLD = 0.5
+
+# Lexical matches always rank above embedding matches of the same confidence.
+EXACT_SCORE = 1.0
+CASE_INSENSITIVE_SCORE = 0.95
+FUZZY_WEIGHT = 0.9
+SEMANTIC_WEIGHT = 0.8
+
+ValueMatch = collections.namedtuple("ValueMatch", ["table", "column", "value", "count", "kind", "score"])
+
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def value_documents(database_path, table_columns):
+    """
+    One Document per distinct value of every low-cardinality text column, read from the SQLite
+    database. `table_columns` maps table names to their parsed Columns.
+    """
+    conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+    try:
+        for table, columns in table_columns.items():
+            for column in columns:
+                if column.type.upper() not in TEXT_TYPES:
+                    continue
+                try:
+                    (distinct,) = conn.execute(f"SELECT COUNT(DISTINCT {quote(column.name)}) FROM {quote(table)}").fetchone()
+                    if distinct > MAX_DISTINCT_VALUES:
+                        continue
+                    rows = conn.execute(
+                        f"SELECT {quote(column.name)}, COUNT(*) FROM {quote(table)} WHERE {quote(column.name)} IS NOT NULL "
+                        f"GROUP BY 1 ORDER BY 2 DESC"
+                    ).fetchall()
+                except sqlite3.OperationalError:
+                    continue  # schema file without a matching table or column in this database
+                for value, count in rows:
+                    yield Document(page_content=str(value), metadata=dict(table=table, column=column.name, value=str(value), count=count))
+    finally:
+        conn.close()
+
+
+def lexical_match(query, value):
+    """(kind, score) of the spelling match between a literal and a stored value, or None."""
+    if value == query:
+        return "EXACT", EXACT_SCORE
+    folded_query, folded_value = query.casefold().strip(), value.casefold()
+    if folded_value == folded_query:
+        return "CASE_INSENSITIVE", CASE_INSENSITIVE_SCORE
+    ratio = difflib.SequenceMatcher(None, folded_query, folded_value).ratio()
+    shorter, longer = sorted((folded_query, folded_value), key=len)
+    if len(shorter) >= MIN_CONTAINED_LENGTH and shorter in longer:
+        ratio = max(ratio, 0.8)
+    if ratio >= FUZZY_THRESHOLD:
+        return "FUZZY", ratio * FUZZY_WEIGHT
+    return None
+
+
+class ValueIndex:
+    """Exact, case-insensitive, fuzzy and embedding lookup over the distinct values of a column store."""
+
+    def __init__(self, vectorstore):
+        self.vectorstore = vectorstore
+        self.documents = [vectorstore.docstore.search(_id) for _id in vectorstore.index_to_docstore_id.values()]
+
+    def lookup(self, query, query_vector, table="", column="", k=10):
+        def in_scope(metadata):
+            return (not table or metadata["table"] == table) and (not column or metadata["column"] == column)
+
+        best = {}
+
+        def add(metadata, kind, score):
+            key = (metadata["table"], metadata["column"], metadata["value"])
+            if key not in best or best[key].score < score:
+                best[key] = ValueMatch(*key, metadata["count"], kind, score)
+
+        for document in self.documents:
+            if in_scope(document.metadata):
+                match = lexical_match(query, document.metadata["value"])
+                if match:
+                    add(document.metadata, *match)
+        hits = self.vectorstore.similarity_search_with_score_by_vector(
+            query_vector, k=k, filter=in_scope, fetch_k=max(len(self.documents), k),
+        )
+        for document, distance in hits:
+            # Squared L2 distance of normalized embeddings: cosine = 1 - d / 2.
+            cosine = 1 - float(distance) / 2
+            if cosine >= SEMANTIC_THRESHOLD:
+                add(document.metadata, "SEMANTIC", cosine * SEMANTIC_WEIGHT)
+        return sorted(best.values(), key=lambda match: -match.score)[:k]
@@ -0,0 +1,24 @@
+from pathlib import Path
+
+from app.schema_graph import SchemaGraph
+
+SCHEMA_FILES_DIR = Path(__file__).resolve().parent.parent / "dataset" / "financial_db_schemas"
+TABLES = ["account", "card", "client", "disp", "district", "loan", "order", "trans"]
+
+
+def financial_graph():
+    return SchemaGraph.from_ddls((SCHEMA_FILES_DIR / f"{table}.sql").read_text() for table in TABLES)
+
+
+def joined(edges):
+    return [(edge.left_table, edge.right_table) for edge in edges]
+
+
+def test_client_and_account_join_through_disp_not_district():
+    graph = financial_graph()
+    assert joined(graph.join_path(["client", "account"])) == [("client", "disp"), ("account", "disp")]
+    assert joined(graph.join_path(["account", "client"])) == [("account", "disp"), ("client", "disp")]
+
+
+def test_district_is_still_joined_directly():
+    assert joined(financial_graph().join_path(["client", "district"])) == [("district", "client")]
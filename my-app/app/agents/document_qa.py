@@ -11,7 +11,7 @@ from langchain_core.messages import SystemMessage
 from langchain_ollama import ChatOllama
 from langgraph.prebuilt import ToolNode
 
-from app.tools.documents import get_documents
+from app.tools.documents import get_documents, get_documents_batch
 
 
 system_message_prompt = """
@@ -44,7 +44,7 @@ You are a specialized AI assistant for [Company Name], exclusively designed to s
 - **Do not express personal opinions or emotions.** Your responses must be based solely on objective facts and data.
 """.rstrip()
 
-tools = [get_documents]
+tools = [get_documents, get_documents_batch]
 model = ChatOllama(
     model=os.environ["MODEL_NAME"], 
     base_url=os.environ["MODEL_BASE_URL"], 
@@ -12,11 +12,11 @@ from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, To
 from langchain_ollama import ChatOllama
 from langgraph.prebuilt import ToolNode
 
-from app.tools.dw import get_table_schemas, execute_query
+from app.tools.dw import get_table_schemas, find_column_values, execute_query
 
 
 text_to_sql_tools = [get_table_schemas]
-sql_corrector_tools = [get_table_schemas, execute_query]
+sql_corrector_tools = [get_table_schemas, find_column_values, execute_query]
 sql_executor_tools = [execute_query]
 
 
@@ -87,10 +87,15 @@ def make_sql_corrector_chain():
 - **핵심 확인 사항:** `WHERE` 절에 사용된 컬럼의 `description` 필드에 값의 종류가 명시적으로 열거되어 있는지 확인합니다.
 - **판단:**
   - 만약 `description` 정보만으로 실제 값을 명확히 알 수 있다면, 그 정보를 바탕으로 즉시 쿼리를 수정합니다. 이는 가장 효율적인 해결 경로입니다.
-  - `description에` 정보가 없거나 불충분할 경우, 2단계인 '데이터 직접 탐색'으로 넘어갑니다.
+  - `description에` 정보가 없거나 불충분할 경우, 2단계인 '저장된 값 조회'로 넘어갑니다.
 
-**2. 2차 조사: 데이터 직접 탐색 (Live Data Exploration)**
-스키마 정보만으로 값의 유효성을 판단할 수 없을 때, `execute_query` 도구를 사용하여 데이터베이스를 직접 탐색합니다. **절대 추측에 의존해서는 안 됩니다.**
+**2. 2차 조사: 저장된 값 조회 (Value Lookup)**
+`find_column_values` 도구로 `WHERE` 절의 값이 실제로 어떤 값으로 저장되어 있는지 한 번에 확인합니다. 대소문자, 오탈자, 유사 표현까지 찾아 줍니다.
+- **도구 사용:** `find_column_values(value="East Bohemia", table="district", column="A3")`
+- **판단:** 사용자의 의도와 일치하는 값이 응답에 있다면 그 값으로 즉시 쿼리를 수정합니다. 일치하는 값이 없을 때만 3단계인 '데이터 직접 탐색'으로 넘어갑니다.
+
+**3. 3차 조사: 데이터 직접 탐색 (Live Data Exploration)**
+값 조회로도 유효성을 판단할 수 없을 때, `execute_query` 도구를 사용하여 데이터베이스를 직접 탐색합니다. **절대 추측에 의존해서는 안 됩니다.**
 - **A. 가설 검증 (Hypothesis Testing):** 먼저, 입력 쿼리에 있는 값이 실제로 존재하는지 최소한의 비용으로 확인합니다.
   - **예시:** 초기 쿼리가 `SELECT ... WHERE status = 'DONE'`일 경우, 다음과 같은 `COUNT` 쿼리를 실행하여 'DONE'의 존재 유무를 빠르게 확인합니다.
     - **탐색 쿼리:** `SELECT COUNT(*) FROM orders WHERE status = 'DONE'`
@@ -102,8 +107,8 @@ def make_sql_corrector_chain():
     - 예를 들면 'DONE'과 'done'은 의미적으로 완전히 같지만, Exact Match 할 경우 Case Sensitive로 인해 매칭에 실패합니다. 적절히 의도를 파악하여 쿼리를 수정하세요.
     - 조건 컬럼 선택에 **모호성이 존재하여 추가 검증이 필요한 경우 데이터 탐색을 반복**할 수 있습니다.
 
-**3. 최종 쿼리 생성 (Final Query Generation)**
-1, 2 단계에서 수집한 모든 증거(스키마 정보, 데이터 탐색 결과)를 종합하여, `WHERE` 조건절이 실제 데이터베이스 값에 기반하도록 수정된 최종 SQL 쿼리 하나를 생성합니다.
+**4. 최종 쿼리 생성 (Final Query Generation)**
+1~3 단계에서 수집한 모든 증거(스키마 정보, 데이터 탐색 결과)를 종합하여, `WHERE` 조건절이 실제 데이터베이스 값에 기반하도록 수정된 최종 SQL 쿼리 하나를 생성합니다.
 - **복잡한 쿼리 예시:**
   - **초기 쿼리:** `SELECT COUNT(T2.account_id) FROM district AS T1 INNER JOIN account AS T2 ON T1.district_id = T2.district_id WHERE T1.A3 = 'East Bohemia' AND T2.frequency = 'POPLATEK PO OBRATU'`
   - 수행 작업: 위 작업 절차에 따라 district 테이블의 A3 컬럼과 account 테이블의 frequency 컬럼 값의 유효성을 각각 확인하고, 필요시 모두 수정해야 합니다.
@@ -22,20 +22,52 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
-from google.protobuf import struct_pb2 as google_dot_protobuf_dot_struct__pb2
+from google.protobuf import field_mask_pb2 as google_dot_protobuf_dot_field__mask__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x15\x64ocument_search.proto\x12\x0f\x64ocument_search\x1a\x1cgoogle/protobuf/struct.proto\"<\n\x15\x44ocumentSearchRequest\x12\r\n\x05query\x18\x01 \x01(\t\x12\x0e\n\x01k\x18\x02 \x01(\x05H\x00\x88\x01\x01\x42\x04\n\x02_k\"B\n\x16\x44ocumentSearchResponse\x12(\n\x07payload\x18\x01 \x01(\x0b\x32\x17.google.protobuf.Struct2\x7f\n\x15\x44ocumentSearchService\x12\x66\n\x11RetrieveDocuments\x12&.document_search.DocumentSearchRequest\x1a\'.document_search.DocumentSearchResponse0\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x15\x64ocument_search.proto\x12\x0f\x64ocument_search\x1a google/protobuf/field_mask.proto\"\xd2\x02\n\x15\x44ocumentSearchRequest\x12\r\n\x05query\x18\x01 \x01(\t\x12\x0e\n\x01k\x18\x02 \x01(\x05H\x00\x88\x01\x01\x12*\n\x06\x66ields\x18\x03 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\x12\x13\n\x06nprobe\x18\x04 \x01(\x05H\x01\x88\x01\x01\x12\x16\n\tef_search\x18\x05 \x01(\x05H\x02\x88\x01\x01\x12,\n\x04mode\x18\x06 \x01(\x0e\x32\x1e.document_search.RetrievalMode\x12\x0e\n\x06rerank\x18\x07 \x01(\x08\x12\x1d\n\x10rerank_budget_ms\x18\x08 \x01(\x05H\x03\x88\x01\x01\x12\x30\n\x07\x66ilters\x18\t \x03(\x0b\x32\x1f.document_search.MetadataFilterB\x04\n\x02_kB\t\n\x07_nprobeB\x0c\n\n_ef_searchB\x13\n\x11_rerank_budget_ms\"\xd9\x02\n\x1a\x44ocumentSearchBatchRequest\x12\x0f\n\x07queries\x18\x01 \x03(\t\x12\x0e\n\x01k\x18\x02 \x01(\x05H\x00\x88\x01\x01\x12*\n\x06\x66ields\x18\x03 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\x12\x13\n\x06nprobe\x18\x04 \x01(\x05H\x01\x88\x01\x01\x12\x16\n\tef_search\x18\x05 \x01(\x05H\x02\x88\x01\x01\x12,\n\x04mode\x18\x06 \x01(\x0e\x32\x1e.document_search.RetrievalMode\x12\x0e\n\x06rerank\x18\x07 \x01(\x08\x12\x1d\n\x10rerank_budget_ms\x18\x08 \x01(\x05H\x03\x88\x01\x01\x12\x30\n\x07\x66ilters\x18\t \x03(\x0b\x32\x1f.document_search.MetadataFilterB\x04\n\x02_kB\t\n\x07_nprobeB\x0c\n\n_ef_searchB\x13\n\x11_rerank_budget_ms\"r\n\rMetadataValue\x12\x16\n\x0cstring_value\x18\x01 \x01(\tH\x00\x12\x13\n\tint_value\x18\x02 \x01(\x03H\x00\x12\x16\n\x0c\x64ouble_value\x18\x03 \x01(\x01H\x00\x12\x14\n\nbool_value\x18\x04 \x01(\x08H\x00\x42\x06\n\x04kind\"C\n\x11MetadataValueList\x12.\n\x06values\x18\x01 \x03(\x0b\x32\x1e.document_search.MetadataValue\"\xa6\x01\n\x0eMetadataFilter\x12\r\n\x05\x66ield\x18\x01 \x01(\t\x12\x30\n\x06\x65quals\x18\x02 \x01(\x0b\x32\x1e.document_search.MetadataValueH\x00\x12\x34\n\x06\x61ny_of\x18\x03 \x01(\x0b\x32\".document_search.MetadataValueListH\x00\x12\x10\n\x06prefix\x18\x04 \x01(\tH\x00\x42\x0b\n\tcondition\"\xce\x02\n\x16\x44ocumentSearchResponse\x12\x13\n\x0bquery_index\x18\x02 \x01(\x05\x12\n\n\x02id\x18\x03 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x04 \x01(\t\x12\r\n\x05score\x18\x05 \x01(\x02\x12\x0e\n\x06source\x18\x06 \x01(\t\x12G\n\x08metadata\x18\x07 \x03(\x0b\x32\x35.document_search.DocumentSearchResponse.MetadataEntry\x12\x15\n\rindex_version\x18\x08 \x01(\t\x12\x10\n\x08reranked\x18\t \x01(\x08\x12\x11\n\trerank_ms\x18\n \x01(\x02\x1aO\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12-\n\x05value\x18\x02 \x01(\x0b\x32\x1e.document_search.MetadataValue:\x02\x38\x01J\x04\x08\x01\x10\x02R\x07payload\"(\n\x18ReloadVectorstoreRequest\x12\x0c\n\x04path\x18\x01 \x01(\t\"D\n\x19ReloadVectorstoreResponse\x12\x10\n\x08reloaded\x18\x01 \x01(\x08\x12\x15\n\rindex_version\x18\x02 \x01(\t\"\x8d\x01\n\x12TableSchemaRequest\x12\r\n\x05query\x18\x01 \x01(\t\x12\x0e\n\x01k\x18\x02 \x01(\x05H\x00\x88\x01\x01\x12*\n\x06\x66ields\x18\x03 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\x12\x17\n\nmax_tokens\x18\x04 \x01(\x05H\x01\x88\x01\x01\x42\x04\n\x02_kB\r\n\x0b_max_tokens\"p\n\x08JoinEdge\x12\x12\n\nleft_table\x18\x01 \x01(\t\x12\x13\n\x0bleft_column\x18\x02 \x01(\t\x12\x13\n\x0bright_table\x18\x03 \x01(\t\x12\x14\n\x0cright_column\x18\x04 \x01(\t\x12\x10\n\x08inferred\x18\x05 \x01(\x08\"x\n\x13TableSchemaResponse\x12\x37\n\x06tables\x18\x01 \x03(\x0b\x32\'.document_search.DocumentSearchResponse\x12(\n\x05joins\x18\x02 \x03(\x0b\x32\x19.document_search.JoinEdge\"X\n\x12\x43olumnValueRequest\x12\r\n\x05query\x18\x01 \x01(\t\x12\r\n\x05table\x18\x02 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x03 \x01(\t\x12\x0e\n\x01k\x18\x04 \x01(\x05H\x00\x88\x01\x01\x42\x04\n\x02_k\"\x88\x01\n\x0b\x43olumnValue\x12\r\n\x05table\x18\x01 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x02 \x01(\t\x12\r\n\x05value\x18\x03 \x01(\t\x12\r\n\x05\x63ount\x18\x04 \x01(\x03\x12-\n\x04kind\x18\x05 \x01(\x0e\x32\x1f.document_search.ValueMatchKind\x12\r\n\x05score\x18\x06 \x01(\x02\"C\n\x13\x43olumnValueResponse\x12,\n\x06values\x18\x01 \x03(\x0b\x32\x1c.document_search.ColumnValue*2\n\rRetrievalMode\x12\t\n\x05\x44\x45NSE\x10\x00\x12\n\n\x06SPARSE\x10\x01\x12\n\n\x06HYBRID\x10\x02*J\n\x0eValueMatchKind\x12\t\n\x05\x45XACT\x10\x00\x12\x14\n\x10\x43\x41SE_INSENSITIVE\x10\x01\x12\t\n\x05\x46UZZY\x10\x02\x12\x0c\n\x08SEMANTIC\x10\x03\x32\xa1\x04\n\x15\x44ocumentSearchService\x12\x66\n\x11RetrieveDocuments\x12&.document_search.DocumentSearchRequest\x1a\'.document_search.DocumentSearchResponse0\x01\x12p\n\x16RetrieveDocumentsBatch\x12+.document_search.DocumentSearchBatchRequest\x1a\'.document_search.DocumentSearchResponse0\x01\x12j\n\x11ReloadVectorstore\x12).document_search.ReloadVectorstoreRequest\x1a*.document_search.ReloadVectorstoreResponse\x12\x61\n\x14RetrieveTableSchemas\x12#.document_search.TableSchemaRequest\x1a$.document_search.TableSchemaResponse\x12_\n\x12LookupColumnValues\x12#.document_search.ColumnValueRequest\x1a$.document_search.ColumnValueResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'document_search_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_DOCUMENTSEARCHREQUEST']._serialized_start=72
-  _globals['_DOCUMENTSEARCHREQUEST']._serialized_end=132
-  _globals['_DOCUMENTSEARCHRESPONSE']._serialized_start=134
-  _globals['_DOCUMENTSEARCHRESPONSE']._serialized_end=200
-  _globals['_DOCUMENTSEARCHSERVICE']._serialized_start=202
-  _globals['_DOCUMENTSEARCHSERVICE']._serialized_end=329
+  _globals['_DOCUMENTSEARCHRESPONSE_METADATAENTRY']._loaded_options = None
+  _globals['_DOCUMENTSEARCHRESPONSE_METADATAENTRY']._serialized_options = b'8\001'
+  _globals['_RETRIEVALMODE']._serialized_start=2246
+  _globals['_RETRIEVALMODE']._serialized_end=2296
+  _globals['_VALUEMATCHKIND']._serialized_start=2298
+  _globals['_VALUEMATCHKIND']._serialized_end=2372
+  _globals['_DOCUMENTSEARCHREQUEST']._serialized_start=77
+  _globals['_DOCUMENTSEARCHREQUEST']._serialized_end=415
+  _globals['_DOCUMENTSEARCHBATCHREQUEST']._serialized_start=418
+  _globals['_DOCUMENTSEARCHBATCHREQUEST']._serialized_end=763
+  _globals['_METADATAVALUE']._serialized_start=765
+  _globals['_METADATAVALUE']._serialized_end=879
+  _globals['_METADATAVALUELIST']._serialized_start=881
+  _globals['_METADATAVALUELIST']._serialized_end=948
+  _globals['_METADATAFILTER']._serialized_start=951
+  _globals['_METADATAFILTER']._serialized_end=1117
+  _globals['_DOCUMENTSEARCHRESPONSE']._serialized_start=1120
+  _globals['_DOCUMENTSEARCHRESPONSE']._serialized_end=1454
+  _globals['_DOCUMENTSEARCHRESPONSE_METADATAENTRY']._serialized_start=1360
+  _globals['_DOCUMENTSEARCHRESPONSE_METADATAENTRY']._serialized_end=1439
+  _globals['_RELOADVECTORSTOREREQUEST']._serialized_start=1456
+  _globals['_RELOADVECTORSTOREREQUEST']._serialized_end=1496
+  _globals['_RELOADVECTORSTORERESPONSE']._serialized_start=1498
+  _globals['_RELOADVECTORSTORERESPONSE']._serialized_end=1566
+  _globals['_TABLESCHEMAREQUEST']._serialized_start=1569
+  _globals['_TABLESCHEMAREQUEST']._serialized_end=1710
+  _globals['_JOINEDGE']._serialized_start=1712
+  _globals['_JOINEDGE']._serialized_end=1824
+  _globals['_TABLESCHEMARESPONSE']._serialized_start=1826
+  _globals['_TABLESCHEMARESPONSE']._serialized_end=1946
+  _globals['_COLUMNVALUEREQUEST']._serialized_start=1948
+  _globals['_COLUMNVALUEREQUEST']._serialized_end=2036
+  _globals['_COLUMNVALUE']._serialized_start=2039
+  _globals['_COLUMNVALUE']._serialized_end=2175
+  _globals['_COLUMNVALUERESPONSE']._serialized_start=2177
+  _globals['_COLUMNVALUERESPONSE']._serialized_end=2244
+  _globals['_DOCUMENTSEARCHSERVICE']._serialized_start=2375
+  _globals['_DOCUMENTSEARCHSERVICE']._serialized_end=2920
 # @@protoc_insertion_point(module_scope)
@@ -39,6 +39,26 @@ class DocumentSearchServiceStub(object):
                 request_serializer=document__search__pb2.DocumentSearchRequest.SerializeToString,
                 response_deserializer=document__search__pb2.DocumentSearchResponse.FromString,
                 _registered_method=True)
+        self.RetrieveDocumentsBatch = channel.unary_stream(
+                '/document_search.DocumentSearchService/RetrieveDocumentsBatch',
+                request_serializer=document__search__pb2.DocumentSearchBatchRequest.SerializeToString,
+                response_deserializer=document__search__pb2.DocumentSearchResponse.FromString,
+                _registered_method=True)
+        self.ReloadVectorstore = channel.unary_unary(
+                '/document_search.DocumentSearchService/ReloadVectorstore',
+                request_serializer=document__search__pb2.ReloadVectorstoreRequest.SerializeToString,
+                response_deserializer=document__search__pb2.ReloadVectorstoreResponse.FromString,
+                _registered_method=True)
+        self.RetrieveTableSchemas = channel.unary_unary(
+                '/document_search.DocumentSearchService/RetrieveTableSchemas',
+                request_serializer=document__search__pb2.TableSchemaRequest.SerializeToString,
+                response_deserializer=document__search__pb2.TableSchemaResponse.FromString,
+                _registered_method=True)
+        self.LookupColumnValues = channel.unary_unary(
+                '/document_search.DocumentSearchService/LookupColumnValues',
+                request_serializer=document__search__pb2.ColumnValueRequest.SerializeToString,
+                response_deserializer=document__search__pb2.ColumnValueResponse.FromString,
+                _registered_method=True)
 
 
 class DocumentSearchServiceServicer(object):
@@ -50,6 +70,33 @@ class DocumentSearchServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def RetrieveDocumentsBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReloadVectorstore(self, request, context):
+        """Admin: load a rebuilt vectorstore in the background and swap it in without dropping requests.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def RetrieveTableSchemas(self, request, context):
+        """dw-search: the table schemas best matching a question plus the joins that connect them.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def LookupColumnValues(self, request, context):
+        """dw-search: stored values of low-cardinality text columns matching a literal, for WHERE clauses.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_DocumentSearchServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -58,6 +105,26 @@ def add_DocumentSearchServiceServicer_to_server(servicer, server):
                     request_deserializer=document__search__pb2.DocumentSearchRequest.FromString,
                     response_serializer=document__search__pb2.DocumentSearchResponse.SerializeToString,
             ),
+            'RetrieveDocumentsBatch': grpc.unary_stream_rpc_method_handler(
+                    servicer.RetrieveDocumentsBatch,
+                    request_deserializer=document__search__pb2.DocumentSearchBatchRequest.FromString,
+                    response_serializer=document__search__pb2.DocumentSearchResponse.SerializeToString,
+            ),
+            'ReloadVectorstore': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReloadVectorstore,
+                    request_deserializer=document__search__pb2.ReloadVectorstoreRequest.FromString,
+                    response_serializer=document__search__pb2.ReloadVectorstoreResponse.SerializeToString,
+            ),
+            'RetrieveTableSchemas': grpc.unary_unary_rpc_method_handler(
+                    servicer.RetrieveTableSchemas,
+                    request_deserializer=document__search__pb2.TableSchemaRequest.FromString,
+                    response_serializer=document__search__pb2.TableSchemaResponse.SerializeToString,
+            ),
+            'LookupColumnValues': grpc.unary_unary_rpc_method_handler(
+                    servicer.LookupColumnValues,
+                    request_deserializer=document__search__pb2.ColumnValueRequest.FromString,
+                    response_serializer=document__search__pb2.ColumnValueResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'document_search.DocumentSearchService', rpc_method_handlers)
@@ -95,3 +162,111 @@ class DocumentSearchService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def RetrieveDocumentsBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/document_search.DocumentSearchService/RetrieveDocumentsBatch',
+            document__search__pb2.DocumentSearchBatchRequest.SerializeToString,
+            document__search__pb2.DocumentSearchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ReloadVectorstore(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/document_search.DocumentSearchService/ReloadVectorstore',
+            document__search__pb2.ReloadVectorstoreRequest.SerializeToString,
+            document__search__pb2.ReloadVectorstoreResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def RetrieveTableSchemas(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/document_search.DocumentSearchService/RetrieveTableSchemas',
+            document__search__pb2.TableSchemaRequest.SerializeToString,
+            document__search__pb2.TableSchemaResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def LookupColumnValues(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/document_search.DocumentSearchService/LookupColumnValues',
+            document__search__pb2.ColumnValueRequest.SerializeToString,
+            document__search__pb2.ColumnValueResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,82 @@
+import atexit
+import itertools
+import threading
+
+import grpc
+
+
+# Keep idle HTTP/2 connections alive between tool calls so they are not re-established per call.
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+
+class ChannelPool:
+    """
+    Long-lived channels for one service. `targets` is a comma separated address list
+    (e.g. "host-a:50051,host-b:50051"); calls are spread over the addresses round-robin.
+    Channels are created on first use and connect lazily on the first RPC.
+    """
+
+    def __init__(self, targets, options=CHANNEL_OPTIONS):
+        self.targets = [target.strip() for target in targets.split(",") if target.strip()]
+        if not self.targets:
+            raise ValueError(f"no gRPC target in {targets!r}")
+        self.options = options
+        self._channels = {}
+        self._stubs = {}
+        self._cycle = itertools.cycle(self.targets)
+        self._lock = threading.Lock()
+
+    def _channel(self, target):
+        channel = self._channels.get(target)
+        if channel is None:
+            channel = grpc.insecure_channel(target, options=self.options)
+            self._channels[target] = channel
+        return channel
+
+    def channel(self):
+        with self._lock:
+            return self._channel(next(self._cycle))
+
+    def stub(self, stub_cls):
+        with self._lock:
+            target = next(self._cycle)
+            key = (target, stub_cls)
+            if key not in self._stubs:
+                self._stubs[key] = stub_cls(self._channel(target))
+            return self._stubs[key]
+
+    def close(self):
+        with self._lock:
+            for channel in self._channels.values():
+                channel.close()
+            self._channels.clear()
+            self._stubs.clear()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(targets):
+    with _pools_lock:
+        pool = _pools.get(targets)
+        if pool is None:
+            pool = _pools[targets] = ChannelPool(targets)
+        return pool
+
+
+def get_stub(targets, stub_cls):
+    return get_pool(targets).stub(stub_cls)
+
+
+@atexit.register
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
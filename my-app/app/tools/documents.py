@@ -2,27 +2,66 @@ import os
 
 from langchain_core.tools import tool
 from langchain_core.documents import Document
-import grpc
 
 from app.proto import document_search_pb2
 from app.proto import document_search_pb2_grpc
+from app.tools.channels import get_stub
+
+
+def source_filters(source):
+    if not source:
+        return []
+    return [document_search_pb2.MetadataFilter(field="source", prefix=source)]
+
+
+def to_document(res):
+    metadata = {key: getattr(value, value.WhichOneof("kind")) for key, value in res.metadata.items()}
+    if res.source:
+        metadata = dict(source=res.source, **metadata)
+    return Document(page_content=res.content, id=res.id or None, metadata=metadata)
 
 
 @tool(response_format="content_and_artifact")
-def get_documents(query: str, count: int = 3):
+def get_documents(query: str, count: int = 3, source: str = ""):
     """
     유저의 질의에 가장 연관성이 높은 문서를 검색할 때 사용합니다.
     일반적인 질문이 아닌 사내 문서 데이터베이스에서 조회가 필요할 때 연관 문서를 가져올 수 있습니다.
     Parameters:
     - query: VectorStore에서 검색하기 위한 쿼리.
     - count: 연관 문서 상위 몇개를 가져올 지. 기본값: 3
+    - source: 이 경로로 시작하는 문서(Source)에서만 검색. 예: 이전 결과의 Source 경로나 그 디렉터리. 기본값: 전체 문서
+    """
+    stub = get_stub(os.environ["DOCUMENT_SEARCH_GRPC_CHANNEL"], document_search_pb2_grpc.DocumentSearchServiceStub)
+    responses = stub.RetrieveDocuments(document_search_pb2.DocumentSearchRequest(
+        query=query, k=count, mode=document_search_pb2.HYBRID, rerank=True, filters=source_filters(source)
+    ))
+    documents = [to_document(res) for res in responses]
+    serialized = "\n\n".join(
+        (f"Source: {doc.metadata}\nContent: {doc.page_content}")
+        for doc in documents
+    )
+    return serialized, documents
+
+
+@tool(response_format="content_and_artifact")
+def get_documents_batch(queries: list[str], count: int = 3, source: str = ""):
+    """
+    여러 개의 질의로 한 번에 문서를 검색할 때 사용합니다.
+    같은 질문을 여러 표현으로 검색하거나 서로 다른 주제를 동시에 찾아야 할 때, get_documents를 여러 번 호출하는 대신 사용하세요.
+    Parameters:
+    - queries: VectorStore에서 검색하기 위한 쿼리 목록.
+    - count: 쿼리별로 연관 문서 상위 몇개를 가져올 지. 기본값: 3
+    - source: 이 경로로 시작하는 문서(Source)에서만 검색. 기본값: 전체 문서
     """
-    with grpc.insecure_channel(os.environ["DOCUMENT_SEARCH_GRPC_CHANNEL"]) as channel:
-        stub = document_search_pb2_grpc.DocumentSearchServiceStub(channel)
-        responses = stub.RetrieveDocuments(document_search_pb2.DocumentSearchRequest(query=query, k=count))
-        documents = [Document(page_content=res.payload['content'], id=res.payload['id'], metadata=res.payload['metadata']) for res in responses]
-        serialized = "\n\n".join(
-            (f"Source: {doc.metadata}\nContent: {doc.page_content}")
-            for doc in documents
-        )
-        return serialized, documents
+    stub = get_stub(os.environ["DOCUMENT_SEARCH_GRPC_CHANNEL"], document_search_pb2_grpc.DocumentSearchServiceStub)
+    responses = stub.RetrieveDocumentsBatch(document_search_pb2.DocumentSearchBatchRequest(
+        queries=queries, k=count, mode=document_search_pb2.HYBRID, rerank=True, filters=source_filters(source)
+    ))
+    documents = [[] for _ in queries]
+    for res in responses:
+        documents[res.query_index].append(to_document(res))
+    serialized = "\n\n".join(
+        (f"Query: {query}\n" + "\n\n".join(f"Source: {doc.metadata}\nContent: {doc.page_content}" for doc in docs))
+        for query, docs in zip(queries, documents)
+    )
+    return serialized, documents
@@ -1,42 +1,97 @@
 import os
+import time
+import grpc
 import requests
 
 from langchain_core.tools import tool
-from langchain_core.documents import Document
-import grpc
+from google.protobuf.field_mask_pb2 import FieldMask
 
 from app.proto import document_search_pb2
 from app.proto import document_search_pb2_grpc
+from app.tools.channels import get_stub
+from app.tools.documents import to_document
+
+# Rows per execute_query call; later pages are fetched with the returned cursor.
+QUERY_PAGE_ROWS = 100
+# Retries of a query the busy server refused (429/503), each after its Retry-After wait.
+QUERY_RETRIES = 2
+
+
+def format_join(edge):
+    return f"{edge.left_table}.{edge.left_column} = {edge.right_table}.{edge.right_column}"
 
 
 @tool(response_format="content_and_artifact")
-def get_table_schemas(query: str):
+def get_table_schemas(query: str, count: int = 3):
     """
     유저가 원하는 데이터를 조회하기 위해 필요한 연관성이 높은 테이블 스키마를 검색할 때 사용합니다.
-    Join과 같은 복잡한 SQL이 요구되는 경우, 관련 테이블이 여러개 있을 수 있습니다.
+    Join과 같은 복잡한 SQL이 요구되는 경우, 관련 테이블 사이의 Join 경로(Join 키 포함)도 함께 응답합니다.
     Parameters:
     - query: VectorStore에서 검색하기 위한 쿼리. 자연어 기반으로 검색할 수 있으므로, 핵심 사용자 질문에 해당하는 자연어을 그대로 사용하세요.
+    - count: 가져올 테이블 스키마 수. 기본값: 3
+    """
+    stub = get_stub(os.environ["DW_SEARCH_GRPC_CHANNEL"], document_search_pb2_grpc.DocumentSearchServiceStub)
+    # Only what the serialized tool output below uses; ids and scores are not sent.
+    fields = FieldMask(paths=["content", "source", "metadata"])
+    response = stub.RetrieveTableSchemas(document_search_pb2.TableSchemaRequest(query=query, k=count, fields=fields))
+    documents = [to_document(res) for res in response.tables]
+    serialized = "\n\n".join(
+        (f"Source: {doc.metadata}\nContent: {doc.page_content}")
+        for doc in documents
+    )
+    if response.joins:
+        serialized += "\n\nJoin path:\n" + "\n".join(format_join(edge) for edge in response.joins)
+    return serialized, documents
+
+
+@tool
+def find_column_values(value: str, table: str = "", column: str = "") -> str:
+    """
+    WHERE 조건에 사용할 문자열 값이 실제 데이터베이스에 어떤 값으로 저장되어 있는지 한 번에 찾을 때 사용합니다.
+    대소문자 차이, 오탈자, 유사한 표현(예: 'done' -> 'completed')까지 찾아 실제 저장된 값과 행 수를 응답합니다.
+    Parameters:
+    - value: 찾으려는 값. 예: 'East Bohemia', 'monthly'
+    - table: 검색할 테이블 이름. 모르면 비워 두세요.
+    - column: 검색할 컬럼 이름. 모르면 비워 두세요.
     """
-    with grpc.insecure_channel(os.environ["DW_SEARCH_GRPC_CHANNEL"]) as channel:
-        stub = document_search_pb2_grpc.DocumentSearchServiceStub(channel)
-        responses = stub.RetrieveDocuments(document_search_pb2.DocumentSearchRequest(query=query, k=10))
-        documents = [Document(page_content=res.payload['content'], id=res.payload['id'], metadata=res.payload['metadata']) for res in responses]
-        serialized = "\n\n".join(
-            (f"Source: {doc.metadata}\nContent: {doc.page_content}")
-            for doc in documents
-        )
-        return serialized, documents
+    stub = get_stub(os.environ["DW_SEARCH_GRPC_CHANNEL"], document_search_pb2_grpc.DocumentSearchServiceStub)
+    try:
+        response = stub.LookupColumnValues(document_search_pb2.ColumnValueRequest(query=value, table=table, column=column))
+    except grpc.RpcError as e:
+        # dw-search runs without the value index when it has no database to read values from.
+        if e.code() != grpc.StatusCode.FAILED_PRECONDITION:
+            raise
+        return "Column value lookup is not available; check the stored values with execute_query instead."
+    if not response.values:
+        return f"No stored values match '{value}'."
+    return "\n".join(
+        f"{match.table}.{match.column} = '{match.value}' "
+        f"({document_search_pb2.ValueMatchKind.Name(match.kind).lower()}, score {match.score:.2f}, {match.count} rows)"
+        for match in response.values
+    )
 
 
 @tool
-def execute_query(sql: str) -> dict:
+def execute_query(sql: str, cursor: str = "") -> dict:
     """
     SQLite 데이터베이스에 SQL을 실행하고 쿼리 결과를 응답합니다.
+    결과는 `columns`(컬럼 이름과 타입)와 `rows`(행마다 값 배열, `columns` 순서)로 최대 100행씩 나뉘어 응답되며, `total_rows`는 전체 행 수(`total_rows_exact`가 false이면 최소 행 수)입니다.
+    다음 행이 필요할 때만 응답의 `next_cursor`를 같은 SQL과 함께 전달하세요. 집계가 필요하면 행을 넘겨 보지 말고 SQL로 집계하세요.
+    실패하면 `detail.code`(SQL_ERROR, QUERY_TIMEOUT, FULL_SCAN 등)와 `detail.hint`를 참고해 쿼리를 수정하세요. 응답에 `guard`가 있으면 인덱스 없이 큰 테이블 전체를 읽는 쿼리이니 인덱스 컬럼으로 조건을 거세요. `guard.truncated`가 true일 때만 결과가 잘린 것입니다.
     Parameters:
     - sql: SQLite에서 실행 가능한 SQL 문자열
+    - cursor: 이전 응답의 `next_cursor`. 첫 페이지는 비워 두세요.
     """
     url = os.environ['SQLITE_SERVER_URL'] + "/query"
     headers = {"Content-Type": "application/json"}
-    payload = {"query": sql}
+    # Columnar results name each column once instead of in every row.
+    payload = {"query": sql, "limit": QUERY_PAGE_ROWS, "format": "columnar"}
+    if cursor:
+        payload["cursor"] = cursor
     response = requests.post(url, headers=headers, json=payload)
+    for _ in range(QUERY_RETRIES):
+        if response.status_code not in (429, 503) or "Retry-After" not in response.headers:
+            break
+        time.sleep(int(response.headers["Retry-After"]))
+        response = requests.post(url, headers=headers, json=payload)
     return response.json()
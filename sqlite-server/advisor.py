@@ -0,0 +1,275 @@
+import argparse
+import collections
+import logging
+import re
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from guard import quote, table_aliases
+from workload import read_workload
+
+logging.basicConfig(level=logging.INFO)
+
+DB_PATH = "data/financial.sqlite"
+WORKLOAD_LOG = "logs/workload.jsonl"
+# Instructions between two progress handler calls while replaying; also the resolution of vm steps.
+STEP_INTERVAL = 100
+# An index has to speed up the queries that use it by at least this much, on top of the indexes
+# already chosen, to be proposed; selection stops when no remaining candidate does.
+MIN_GAIN = 0.1
+MAX_INDEX_COLUMNS = 6
+
+REFERENCE = r"(?:(\w+)\.)?(\w+)"
+COMPARISON_PATTERN = re.compile(
+    REFERENCE + r"\s*(=|==|<>|!=|<=|>=|<|>|\bin\b|\bbetween\b|\blike\b|\bglob\b|\bis\b)\s*(?:" + REFERENCE + r")?",
+    re.IGNORECASE,
+)
+ORDERING_PATTERN = re.compile(r"\b(?:group|order)\s+by\s+(.*?)(?:\bhaving\b|\border\s+by\b|\blimit\b|\)|$)", re.IGNORECASE | re.DOTALL)
+EQUALITY_OPERATORS = {"=", "==", "in", "is"}
+RANGE_OPERATORS = {"<", ">", "<=", ">=", "between", "like", "glob"}
+
+Index = collections.namedtuple("Index", ["table", "columns"])
+
+
+def index_name(index):
+    return "advisor_" + "_".join((index.table,) + index.columns).lower()
+
+
+def create_statement(index):
+    columns = ", ".join(quote(column) for column in index.columns)
+    return f"CREATE INDEX IF NOT EXISTS {quote(index_name(index))} ON {quote(index.table)} ({columns})"
+
+
+def read_schema(conn):
+    """({table: column names}, {table: column tuples of existing indexes, the rowid key included})."""
+    columns, indexes = {}, collections.defaultdict(list)
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+        info = conn.execute(f"PRAGMA table_info({quote(table)})").fetchall()
+        columns[table] = [row[1] for row in info]
+        primary_keys = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+        if primary_keys:
+            indexes[table].append(tuple(primary_keys))
+        for index in conn.execute(f"PRAGMA index_list({quote(table)})"):
+            indexes[table].append(tuple(row[2] for row in conn.execute(f"PRAGMA index_info({quote(index[1])})")))
+    return columns, indexes
+
+
+def column_uses(sql, columns):
+    """
+    {table: {"equality", "range", "join", "ordering", "all": [columns]}} for the columns a query
+    filters, joins, groups or sorts on. A heuristic over the SQL text: unqualified names are
+    attributed to every referenced table that has such a column.
+    """
+    aliases = {alias: table for alias, table in table_aliases(sql).items() if table in columns}
+    tables = set(aliases.values())
+
+    def resolve(qualifier, name):
+        if qualifier:
+            table = aliases.get(qualifier.lower())
+            return [(table, name)] if table and name in columns[table] else []
+        return [(table, name) for table in tables if name in columns[table]]
+
+    uses = {table: collections.defaultdict(list) for table in tables}
+
+    def add(kind, references):
+        for table, column in references:
+            if column not in uses[table][kind]:
+                uses[table][kind].append(column)
+
+    for qualifier, name, operator, other_qualifier, other_name in COMPARISON_PATTERN.findall(sql):
+        left = resolve(qualifier, name)
+        right = resolve(other_qualifier, other_name) if other_name else []
+        if right and operator in ("=", "=="):
+            add("join", left + right)
+        elif operator.lower() in EQUALITY_OPERATORS:
+            add("equality", left)
+        elif operator.lower() in RANGE_OPERATORS:
+            add("range", left)
+    for clause in ORDERING_PATTERN.findall(sql):
+        for item in clause.split(","):
+            match = re.match(r"\s*" + REFERENCE, item)
+            if match:
+                add("ordering", resolve(*match.groups()))
+    for qualifier, name in re.findall(REFERENCE, sql):
+        add("all", resolve(qualifier, name))
+    return uses
+
+
+def candidates(sql, columns, existing):
+    """Composite, join and covering index candidates for one query, minus those an existing index already covers."""
+    for table, use in column_uses(sql, columns).items():
+        # Equality and join columns first, then one range column; sort columns when nothing filters.
+        lookup = list(dict.fromkeys(use["equality"] + use["join"]))
+        key = (lookup[:MAX_INDEX_COLUMNS - 1] + use["range"][:1]) or use["ordering"][:MAX_INDEX_COLUMNS]
+        options = [tuple(key)] if key else []
+        options += [(column,) for column in use["join"]]
+        if key:
+            covering = list(dict.fromkeys(key + use["all"]))
+            if len(covering) <= MAX_INDEX_COLUMNS:
+                options.append(tuple(covering))
+        for cols in dict.fromkeys(options):
+            if not any(index[:len(cols)] == cols for index in existing[table]):
+                yield Index(table, cols)
+
+
+class Replayer:
+    """Runs workload queries against a database, measuring median latency and virtual machine steps."""
+
+    def __init__(self, path, repeat, timeout):
+        self.conn = sqlite3.connect(path)
+        self.repeat = repeat
+        self.timeout = timeout
+
+    def steps(self, sql):
+        """VM steps of one run, or None when it runs past the timeout."""
+        count = 0
+        deadline = time.monotonic() + self.timeout
+
+        def progress():
+            nonlocal count
+            count += 1
+            return time.monotonic() > deadline
+
+        self.conn.set_progress_handler(progress, STEP_INTERVAL)
+        try:
+            self.conn.execute(sql).fetchall()
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            self.conn.set_progress_handler(None, 0)
+        return count * STEP_INTERVAL
+
+    def measure(self, sql):
+        """(median ms, vm steps); a query past the timeout counts as taking the timeout."""
+        steps = self.steps(sql)
+        if steps is None:
+            return self.timeout * 1000, None
+        latencies = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            self.conn.execute(sql).fetchall()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return statistics.median(latencies), steps
+
+    def uses(self, sql, index):
+        pattern = re.compile(rf"\bINDEX {re.escape(index_name(index))}\b")
+        return any(pattern.search(detail) for *_, detail in self.conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+
+    def try_index(self, index, templates, current):
+        """
+        (ms saved, ms spent before, {template: measurement}) of adding `index` to the indexes already
+        created, over the templates whose plan uses it and against their `current` measurements.
+        The index is dropped again.
+        """
+        self.conn.execute(create_statement(index))
+        try:
+            measured = {template: self.measure(sql) for template, _, sql in templates if self.uses(sql, index)}
+        finally:
+            self.conn.execute(f"DROP INDEX {quote(index_name(index))}")
+        counts = {template: count for template, count, _ in templates}
+        saved = sum(counts[template] * (current[template][0] - ms) for template, (ms, _) in measured.items())
+        spent = sum(counts[template] * current[template][0] for template in measured)
+        return saved, spent, measured
+
+
+def load_templates(log_path, limit):
+    """The `limit` templates with the most logged execution time, as (template, count, latest query)."""
+    totals, counts, latest = collections.Counter(), collections.Counter(), {}
+    for entry in read_workload(log_path):
+        if entry.get("error") or entry.get("cached") or entry.get("stream") or "latency_ms" not in entry:
+            continue
+        template = entry["template"]
+        totals[template] += entry["latency_ms"]
+        counts[template] += 1
+        latest[template] = entry["query"]
+    return [(template, counts[template], latest[template]) for template, _ in totals.most_common(limit)]
+
+
+def advise(db_path, log_path, num_templates, max_indexes, repeat, timeout, apply):
+    """
+    Propose indexes for the logged workload: candidates are mined from the most expensive query
+    templates and chosen greedily on a copy of the database. Each round tries every remaining
+    candidate on top of the indexes chosen so far and keeps the one that saves the most time, until
+    none saves MIN_GAIN of the time its queries still take. The chosen set is replayed together
+    for the before/after report.
+    """
+    templates = load_templates(log_path, num_templates)
+    if not templates:
+        logging.warning(f"no executed queries in {log_path}")
+        return []
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = str(Path(tmp) / "copy.sqlite")
+        with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as source, sqlite3.connect(copy) as target:
+            source.backup(target)
+        replayer = Replayer(copy, repeat, timeout)
+        columns, existing = read_schema(replayer.conn)
+        before = {template: replayer.measure(sql) for template, _, sql in templates}
+        logging.info(f"replayed {len(templates)} query templates")
+
+        proposals = {}
+        for _, _, sql in templates:
+            for index in candidates(sql, columns, existing):
+                proposals.setdefault(index, None)
+        chosen, remaining, current = [], list(proposals), dict(before)
+        while remaining and len(chosen) < max_indexes:
+            best = None
+            for index in list(remaining):
+                saved, spent, measured = replayer.try_index(index, templates, current)
+                logging.info(f"{index_name(index)}: used by {len(measured)} templates, saves {saved:.1f} ms")
+                if not measured or saved <= MIN_GAIN * spent:
+                    # More chosen indexes only leave less to save, so it is not tried again.
+                    remaining.remove(index)
+                elif best is None or saved > best[0]:
+                    best = (saved, index, measured)
+            if best is None:
+                break
+            saved, index, measured = best
+            replayer.conn.execute(create_statement(index))
+            chosen.append(index)
+            remaining.remove(index)
+            current.update(measured)
+            logging.info(f"chose {index_name(index)}, saving {saved:.1f} ms")
+        after = {template: replayer.measure(sql) for template, _, sql in templates} if chosen else before
+        replayer.conn.close()
+
+    report(templates, before, after, chosen)
+    if apply and chosen:
+        with sqlite3.connect(db_path) as conn:
+            for index in chosen:
+                conn.execute(create_statement(index))
+        logging.info(f"created {len(chosen)} indexes in {db_path}")
+    return chosen
+
+
+def format_steps(steps):
+    return "timeout" if steps is None else f"{steps:,}"
+
+
+def report(templates, before, after, chosen):
+    print(f"{'count':>6} {'before ms':>10} {'after ms':>10} {'speedup':>8} {'vm steps before':>16} {'vm steps after':>15}  template")
+    total_before = total_after = 0.0
+    for template, count, _ in templates:
+        (before_ms, before_steps), (after_ms, after_steps) = before[template], after[template]
+        total_before += count * before_ms
+        total_after += count * after_ms
+        speedup = before_ms / after_ms if after_ms else float("inf")
+        print(f"{count:>6} {before_ms:>10.2f} {after_ms:>10.2f} {speedup:>7.1f}x "
+              f"{format_steps(before_steps):>16} {format_steps(after_steps):>15}  {template[:100]}")
+    print(f"\nworkload time {total_before:.1f} ms -> {total_after:.1f} ms")
+    print("\n".join(create_statement(index) + ";" for index in chosen) or "no index proposed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Propose indexes for the logged query workload.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--log", default=WORKLOAD_LOG)
+    parser.add_argument("--templates", type=int, default=50, help="most expensive query templates to replay")
+    parser.add_argument("--max-indexes", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per query")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds before a replayed query is abandoned")
+    parser.add_argument("--apply", action="store_true", help="create the proposed indexes in --db")
+    args = parser.parse_args()
+    advise(args.db, args.log, args.templates, args.max_indexes, args.repeat, args.timeout, args.apply)
@@ -1,34 +1,338 @@
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import os
 import sqlite3
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 import uvicorn
 
-app = FastAPI()
+from cache import ResultCache, database_version, normalize_sql
+from executor import QueryExecutor, Saturated
+from formats import ARROW, ARROW_MEDIA_TYPE, MEDIA_TYPES, RECORDS, encode_json, encode_result
+from guard import PlanGuard, query_plan
+from pool import ConnectionPool, PoolTimeout
+from workload import WorkloadLog
 
 DB_PATH = "data/financial.sqlite"
 
+POOL_SIZE = int(os.environ.get("POOL_SIZE", "8"))
+# Queries run on QUERY_WORKERS dedicated threads; up to QUERY_QUEUE_SIZE more wait for one, each for
+# at most QUERY_QUEUE_TIMEOUT seconds. Streams keep their connection between batches, so the pool
+# should be larger than the number of workers when streaming is used.
+QUERY_WORKERS = int(os.environ.get("QUERY_WORKERS", str(POOL_SIZE)))
+QUERY_QUEUE_SIZE = int(os.environ.get("QUERY_QUEUE_SIZE", str(4 * QUERY_WORKERS)))
+QUERY_QUEUE_TIMEOUT = float(os.environ.get("QUERY_QUEUE_TIMEOUT", "5"))
+POOL_TIMEOUT = float(os.environ.get("POOL_TIMEOUT", "30"))
+CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", "65536"))
+MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(1 << 30)))
+FETCH_SIZE = 500
+# Rows past a page that are counted for its total_rows hint; beyond this the hint is a lower bound.
+COUNT_SCAN_LIMIT = int(os.environ.get("COUNT_SCAN_LIMIT", "10000"))
+RESULT_CACHE_BYTES = int(os.environ.get("RESULT_CACHE_BYTES", str(64 << 20)))
+QUERY_TIMEOUT_MS = int(os.environ.get("QUERY_TIMEOUT_MS", "10000"))
+# SQLite virtual machine instructions between two checks of a query's deadline and cancellation.
+PROGRESS_INTERVAL = 10000
+DISCONNECT_POLL_SECONDS = 0.1
+# off | limit: a query that full-scans a large table returns its first GUARD_ROW_LIMIT rows | reject
+QUERY_GUARD = os.environ.get("QUERY_GUARD", "limit")
+LARGE_TABLE_ROWS = int(os.environ.get("LARGE_TABLE_ROWS", "100000"))
+GUARD_ROW_LIMIT = int(os.environ.get("GUARD_ROW_LIMIT", "1000"))
+# Every executed query with its latency, work and plan, for advisor.py; empty (default) disables.
+WORKLOAD_LOG = os.environ.get("WORKLOAD_LOG", "")
+
+pool = ConnectionPool(DB_PATH, POOL_SIZE, cache_size_kb=CACHE_SIZE_KB, mmap_size=MMAP_SIZE, timeout=POOL_TIMEOUT)
+result_cache = ResultCache(RESULT_CACHE_BYTES)
+plan_guard = PlanGuard(LARGE_TABLE_ROWS, GUARD_ROW_LIMIT)
+query_executor = QueryExecutor(QUERY_WORKERS, QUERY_QUEUE_SIZE, QUERY_QUEUE_TIMEOUT)
+workload_log = WorkloadLog(WORKLOAD_LOG)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    query_executor.shutdown()
+    pool.close()
+    workload_log.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
 class QueryRequest(BaseModel):
     query: str
+    # Page size; without it the whole result is returned.
+    limit: int | None = Field(default=None, gt=0)
+    # next_cursor of the previous page of the same query.
+    cursor: str | None = None
+    # Time budget, at most QUERY_TIMEOUT_MS.
+    timeout_ms: int | None = Field(default=None, gt=0)
+    # records: {"data": [{column: value}]} | columnar: {"columns", "rows"} | arrow: Arrow IPC stream.
+    # Without it, an Accept header of application/vnd.apache.arrow.stream selects arrow.
+    format: Literal["records", "columnar", "arrow"] | None = None
 
-@app.post("/query")
-def execute_query(request: QueryRequest):
+
+class QueryBudget:
+    """
+    SQLite progress handler that interrupts the running statement once its deadline has passed
+    or the request was cancelled; `reason` tells which. It is called every PROGRESS_INTERVAL
+    instructions, so `checks` also measures the work done.
+    """
+
+    def __init__(self, timeout_ms):
+        self.seconds = min(timeout_ms or QUERY_TIMEOUT_MS, QUERY_TIMEOUT_MS) / 1000
+        self.deadline = time.monotonic() + self.seconds
+        self.cancelled = threading.Event()
+        self.reason = None
+        self.checks = 0
+
+    def restart(self):
+        self.deadline = time.monotonic() + self.seconds
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @property
+    def vm_steps(self):
+        return self.checks * PROGRESS_INTERVAL
+
+    def __call__(self):
+        self.checks += 1
+        if self.cancelled.is_set():
+            self.reason = "cancelled"
+        elif time.monotonic() > self.deadline:
+            self.reason = "timeout"
+        return self.reason is not None
+
+
+def query_error(status_code, code, message, headers=None, **details):
+    """HTTPException with a {"code", "message", ...} detail the agent can branch on."""
+    return HTTPException(status_code=status_code, detail=dict(code=code, message=message, **details), headers=headers)
+
+
+def saturated_error(e):
+    return query_error(e.status_code, e.code, f"Server Busy: {e}", headers={"Retry-After": str(e.retry_after)},
+                       retry_after_seconds=e.retry_after)
+
+
+def sql_error(e, budget):
+    if budget.reason == "timeout":
+        return query_error(504, "QUERY_TIMEOUT", f"Query exceeded its {budget.seconds * 1000:.0f} ms budget",
+                           hint="Add selective WHERE conditions or LIMIT, or aggregate fewer rows")
+    if budget.reason == "cancelled":
+        return query_error(499, "QUERY_CANCELLED", "Client disconnected; query cancelled")
+    return query_error(400, "SQL_ERROR", f"SQL Error: {e}")
+
+
+def query_hash(query):
+    return hashlib.sha1(normalize_sql(query).encode()).hexdigest()[:16]
+
+
+def encode_cursor(query, offset):
+    state = json.dumps({"query": query_hash(query), "offset": offset})
+    return base64.urlsafe_b64encode(state.encode()).decode()
+
+
+def decode_cursor(cursor, query):
+    """Row offset of a continuation cursor; the cursor has to come from the same query."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        offset = int(state["offset"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("malformed cursor") from None
+    if state.get("query") != query_hash(query) or offset < 0:
+        raise ValueError("cursor belongs to a different query")
+    return offset
 
-        cursor.execute(request.query)
-        rows = cursor.fetchall()
-        
-        result = [dict(row) for row in rows]
-        conn.close()
-        
-        return {"data": result}
+
+def skip_rows(cursor, count):
+    while count > 0 and (rows := cursor.fetchmany(min(count, FETCH_SIZE))):
+        count -= len(rows)
+
+
+def count_rows(cursor, limit):
+    """(rows left in the cursor, counting at most `limit`, whether that is all of them)."""
+    count = 0
+    while count < limit:
+        rows = cursor.fetchmany(min(FETCH_SIZE, limit - count))
+        if not rows:
+            return count, True
+        count += len(rows)
+    return count, cursor.fetchone() is None
+
+
+def read_page(cursor, query, offset, limit):
+    """
+    (rows, page fields) of one page of a result, re-read from the start of the query: rows are
+    stepped over, not materialized, so memory stays bounded by the page size whatever the offset.
+    """
+    skip_rows(cursor, offset)
+    rows = cursor.fetchmany(limit) if limit else cursor.fetchall()
+    remaining, exact = count_rows(cursor, COUNT_SCAN_LIMIT)
+    end = offset + len(rows)
+    return rows, {
+        "next_cursor": encode_cursor(query, end) if remaining or not exact else None,
+        "total_rows": end + remaining,
+        "total_rows_exact": exact,
+    }
+
+
+def check_plan(conn, query, plan, version):
+    """The guard finding for `query`, or None; raises when QUERY_GUARD rejects it."""
+    if QUERY_GUARD == "off":
+        return None
+    finding = plan_guard.check(conn, query, plan, version)
+    if finding and QUERY_GUARD == "reject":
+        raise query_error(422, **finding)
+    return finding
+
+
+def run_query(query, offset, limit, budget, version, format):
+    """The encoded result; runs on a worker thread, encoding included."""
+    with pool.connection() as conn:
+        budget.restart()  # time waiting for a connection does not count
+        if budget.cancelled.is_set():
+            budget.reason = "cancelled"
+            raise sqlite3.OperationalError("interrupted")  # cancelled while queued
+        conn.set_progress_handler(budget, PROGRESS_INTERVAL)
+        started = time.perf_counter()
+        plan = []
+        try:
+            plan = query_plan(conn, query)
+            guard = check_plan(conn, query, plan, version)
+            guard_limited = bool(guard) and not limit
+            if guard_limited:
+                limit = GUARD_ROW_LIMIT
+            cursor = conn.cursor()
+
+            cursor.execute(query)
+            columns = [column[0] for column in cursor.description or ()]
+            if limit or offset:
+                rows, extra = read_page(cursor, query, offset, limit)
+            else:
+                rows, extra = cursor.fetchall(), {}
+        except (sqlite3.Error, HTTPException) as e:
+            error = e.detail if isinstance(e, HTTPException) else sql_error(e, budget).detail
+            workload_log.record(query, latency_ms=(time.perf_counter() - started) * 1000,
+                                vm_steps=budget.vm_steps, plan=plan, error=error["code"])
+            raise
+
+    workload_log.record(query, latency_ms=(time.perf_counter() - started) * 1000, vm_steps=budget.vm_steps,
+                        rows=len(rows), plan=plan, guard=guard is not None)
+    if guard:
+        # Truncated only when the guard's own row limit left rows behind, not when the caller paged.
+        extra["guard"] = dict(guard, truncated=guard_limited and extra.get("next_cursor") is not None)
+    return encode_result(format, columns, rows, extra)
+
+
+async def cancel_on_disconnect(http_request, budget):
+    while not await http_request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+    budget.cancel()
+
+
+@app.post("/query")
+async def execute_query(request: QueryRequest, http_request: Request):
+    """
+    Results are cached by normalized SQL and page until the database file changes; the X-Cache
+    header tells whether one came from the cache. A cached result keeps the column names as
+    spelled by the query that filled it.
+
+    The query runs on a query worker under a time budget and is interrupted when the client
+    disconnects. Errors carry a {"code", "message"} detail; when the workers and their queue are
+    saturated the answer is a 429 or 503 with a Retry-After header.
+    """
+    try:
+        offset = decode_cursor(request.cursor, request.query) if request.cursor else 0
+    except ValueError as e:
+        raise query_error(400, "INVALID_CURSOR", f"Invalid cursor: {e}")
+    format = request.format or (ARROW if ARROW_MEDIA_TYPE in http_request.headers.get("accept", "") else RECORDS)
+    budget = QueryBudget(request.timeout_ms)
+    watcher = asyncio.create_task(cancel_on_disconnect(http_request, budget))
+    try:
+        key = (normalize_sql(request.query), offset, request.limit, format)
+        version = database_version(DB_PATH)
+        body = result_cache.get(key, version)
+        if body is not None:
+            workload_log.record(request.query, cached=True)
+            return Response(body, media_type=MEDIA_TYPES[format], headers={"X-Cache": "HIT"})
+        body = await query_executor.run(run_query, request.query, offset, request.limit, budget, version, format)
+        result_cache.put(key, body, version)
+        return Response(body, media_type=MEDIA_TYPES[format], headers={"X-Cache": "MISS"})
         
+    except HTTPException:
+        raise
+    except Saturated as e:
+        raise saturated_error(e)
     except sqlite3.Error as e:
-        raise HTTPException(status_code=400, detail=f"SQL Error: {e}")
+        raise sql_error(e, budget)
+    except PoolTimeout as e:
+        raise query_error(503, "SERVER_BUSY", f"Server Busy: {e}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Server Error: {e}")
+        raise query_error(500, "SERVER_ERROR", f"Server Error: {e}")
+    finally:
+        watcher.cancel()
+
+
+def json_line(value):
+    return encode_json(value) + "\n"
+
+
+def stream_rows(query, budget):
+    """
+    NDJSON lines of a result: a {"columns": [...]} header, then one array of values per row, read
+    FETCH_SIZE rows at a time. An error after the header ends the stream with an {"error": ...} line.
+    The time budget applies to the first row and then to each batch, not to the whole transfer.
+    """
+    with pool.connection() as conn:
+        conn.set_progress_handler(budget, PROGRESS_INTERVAL)
+        started = time.perf_counter()
+        if QUERY_GUARD == "reject":
+            check_plan(conn, query, query_plan(conn, query), database_version(DB_PATH))
+        cursor = conn.execute(query)
+        yield json_line({"columns": [column[0] for column in cursor.description or ()]})
+        count = 0
+        try:
+            while True:
+                budget.restart()
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                count += len(rows)
+                yield "".join(json_line(tuple(row)) for row in rows)
+        except sqlite3.Error as e:
+            yield json_line({"error": sql_error(e, budget).detail})
+        workload_log.record(query, latency_ms=(time.perf_counter() - started) * 1000, vm_steps=budget.vm_steps,
+                            rows=count, stream=True)
+
+
+@app.post("/query/stream")
+async def stream_query(request: QueryRequest):
+    """Admitted like /query; only the statement's first row runs on a query worker."""
+    budget = QueryBudget(request.timeout_ms)
+    lines = stream_rows(request.query, budget)
+    try:
+        # Run the statement before answering, so SQL errors still get a status code.
+        header = await query_executor.run(next, lines)
+    except Saturated as e:
+        raise saturated_error(e)
+    except sqlite3.Error as e:
+        raise sql_error(e, budget)
+    except PoolTimeout as e:
+        raise query_error(503, "SERVER_BUSY", f"Server Busy: {e}")
+    return StreamingResponse(itertools.chain([header], lines), media_type="application/x-ndjson")
+
+
+@app.get("/stats")
+def stats():
+    return {"executor": query_executor.stats(), "pool": pool.stats(), "result_cache": result_cache.stats()}
 
 
 if __name__ == '__main__':
@@ -0,0 +1,91 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Quoted strings and identifiers, kept verbatim: a double-quoted word can be a string literal in SQLite.
+QUOTED_PATTERN = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])""")
+
+
+def normalize_sql(sql):
+    """Collapse whitespace and case outside quoted text and drop trailing semicolons."""
+    parts = QUOTED_PATTERN.split(sql.strip().rstrip(";").strip())
+    # split() with a capturing group puts the quoted parts at odd positions.
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part.lower()) for i, part in enumerate(parts))
+
+
+def database_version(path):
+    """Modification time and size of the database file and its WAL; any write changes it."""
+    version = []
+    for file in (path, f"{path}-wal"):
+        try:
+            stat = os.stat(file)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+class ResultCache:
+    """
+    Encoded responses by query, bounded by their total size in bytes with least-recently-used
+    eviction. Entries belong to one database version; the cache empties itself when it changes.
+    """
+
+    def __init__(self, max_bytes, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 16
+        self.version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self.bytes = 0
+            self.version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, body, version):
+        size = len(body)
+        if size > self.max_entry_bytes or self.max_bytes <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return  # the database changed while the query ran
+            if key in self._data:
+                self.bytes -= len(self._data[key])
+            self._data[key] = body
+            self._data.move_to_end(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return dict(
+                size=len(self._data),
+                bytes=self.bytes,
+                max_bytes=self.max_bytes,
+                hits=self.hits,
+                misses=self.misses,
+                hit_ratio=self.hits / lookups if lookups else 0.0,
+                invalidations=self.invalidations,
+            )
@@ -0,0 +1,101 @@
+import asyncio
+import collections
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Weight of the latest run in the moving average used for retry hints.
+EXEC_TIME_SMOOTHING = 0.1
+LATENCY_WINDOW = 1000
+
+
+class Saturated(Exception):
+    """A query was not admitted; `retry_after` is the suggested wait in seconds."""
+
+    def __init__(self, status_code, code, message, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.retry_after = retry_after
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+class QueryExecutor:
+    """
+    Dedicated worker threads for queries behind a bounded admission queue. At most `workers`
+    queries run at once; up to `max_queue` more wait for a worker, each for at most
+    `queue_timeout` seconds. Anything beyond is refused right away with a retry hint, so latency
+    stays predictable under bursts instead of every query slowing down. Counters are only touched
+    on the event loop.
+    """
+
+    def __init__(self, workers, max_queue, queue_timeout):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._threads = ThreadPoolExecutor(workers, thread_name_prefix="query")
+        self._slots = asyncio.Semaphore(workers)
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_timeouts = 0
+        self.queue_wait_seconds = 0.0
+        self.exec_seconds = 0.0
+        self.average_exec_seconds = 0.0
+        self._exec_times = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def retry_after(self):
+        """Seconds until the queries ahead are likely done, at least 1."""
+        backlog = (self.running + self.queued) / self.workers
+        return max(1, math.ceil(backlog * self.average_exec_seconds))
+
+    async def run(self, func, *args):
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Saturated(429, "QUEUE_FULL", f"{self.queued} queries already waiting", self.retry_after())
+        self.queued += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except TimeoutError:
+            self.queue_timeouts += 1
+            raise Saturated(503, "QUEUE_TIMEOUT", f"no worker free within {self.queue_timeout:g}s", self.retry_after()) from None
+        finally:
+            self.queued -= 1
+        self.admitted += 1
+        self.running += 1
+        self.queue_wait_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._threads, func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.running -= 1
+            self._slots.release()
+            self.exec_seconds += elapsed
+            self._exec_times.append(elapsed)
+            self.average_exec_seconds += EXEC_TIME_SMOOTHING * (elapsed - self.average_exec_seconds)
+
+    def stats(self):
+        exec_times = sorted(self._exec_times)
+        return dict(
+            workers=self.workers,
+            running=self.running,
+            queued=self.queued,
+            max_queue=self.max_queue,
+            admitted=self.admitted,
+            rejected=self.rejected,
+            queue_timeouts=self.queue_timeouts,
+            avg_queue_wait_ms=self.queue_wait_seconds / self.admitted * 1000 if self.admitted else 0.0,
+            avg_exec_ms=self.exec_seconds / self.admitted * 1000 if self.admitted else 0.0,
+            p50_exec_ms=percentile(exec_times, 0.5) * 1000,
+            p95_exec_ms=percentile(exec_times, 0.95) * 1000,
+            max_exec_ms=exec_times[-1] * 1000 if exec_times else 0.0,
+        )
+
+    def shutdown(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,67 @@
+import json
+
+RECORDS = "records"
+COLUMNAR = "columnar"
+ARROW = "arrow"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MEDIA_TYPES = {RECORDS: "application/json", COLUMNAR: "application/json", ARROW: ARROW_MEDIA_TYPE}
+
+STORAGE_CLASSES = {int: "integer", float: "real", str: "text", bytes: "blob"}
+
+
+def encode_json(value):
+    return json.dumps(value, ensure_ascii=False, default=lambda data: data.decode(errors="replace"))
+
+
+def column_type(values):
+    """SQLite storage class shared by a column's non-null values: integer, real, text, blob, null or mixed."""
+    classes = {STORAGE_CLASSES.get(type(value), "text") for value in values if value is not None}
+    if classes == {"integer", "real"}:
+        return "real"
+    if len(classes) > 1:
+        return "mixed"
+    return classes.pop() if classes else "null"
+
+
+def encode_records(columns, rows, extra):
+    """{"data": [{column: value}, ...], **extra}: one object per row."""
+    return encode_json({"data": [dict(zip(columns, row)) for row in rows], **extra}).encode()
+
+
+def encode_columnar(columns, rows, extra):
+    """{"columns": [{"name", "type"}], "rows": [[value, ...]], **extra}: column names are sent once."""
+    types = [column_type(values) for values in zip(*rows)] if rows else ["null"] * len(columns)
+    return encode_json({
+        "columns": [{"name": name, "type": type_} for name, type_ in zip(columns, types)],
+        "rows": [tuple(row) for row in rows],
+        **extra,
+    }).encode()
+
+
+def encode_arrow(columns, rows, extra):
+    """
+    Arrow IPC stream of one record batch; `extra` (page cursor, row count hint, guard) is stored
+    as JSON in the schema metadata. Columns of mixed storage classes become strings.
+    """
+    import pyarrow as pa
+
+    arrays = []
+    for values in (zip(*rows) if rows else [()] * len(columns)):
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array([None if value is None else str(value) for value in values], type=pa.string()))
+    # Names are assigned by position, so duplicate column names survive.
+    schema = pa.schema([pa.field(name, array.type) for name, array in zip(columns, arrays)],
+                       metadata={key: encode_json(value) for key, value in extra.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(pa.record_batch(arrays, schema=schema))
+    return sink.getvalue().to_pybytes()
+
+
+ENCODERS = {RECORDS: encode_records, COLUMNAR: encode_columnar, ARROW: encode_arrow}
+
+
+def encode_result(format, columns, rows, extra):
+    return ENCODERS[format](columns, rows, extra)
@@ -0,0 +1,239 @@
+import re
+import sqlite3
+import threading
+
+from cache import QUOTED_PATTERN
+
+# "SCAN t" without "USING ... INDEX" reads every row of t; older SQLite writes "SCAN TABLE t AS x".
+SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?(\w+)(.*)$")
+TABLE_REFERENCE_PATTERN = re.compile(r"\b(?:from|join)\s+[\"`\[]?(\w+)[\"`\]]?(?:\s+(?:as\s+)?(\w+))?", re.IGNORECASE)
+NOT_ALIASES = {
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "outer", "on", "using",
+    "group", "order", "limit", "union", "except", "intersect", "window", "having",
+}
+AGGREGATE_CALL_PATTERN = re.compile(r"\b(count|sum|avg|total|group_concat|string_agg|min|max)\s*\(", re.IGNORECASE)
+# Top-level clauses that let an aggregate query return more than one row.
+MULTI_ROW_PATTERN = re.compile(r"\b(?:group\s+by|union|except|intersect|over)\b", re.IGNORECASE)
+# Top-level clauses that make the rows of a GROUP BY more than one per group.
+UNGROUPED_PATTERN = re.compile(r"\b(?:union|except|intersect|over)\b", re.IGNORECASE)
+GROUP_BY_PATTERN = re.compile(r"\bgroup\s+by\b", re.IGNORECASE)
+GROUP_BY_END_PATTERN = re.compile(r"\b(?:having|order\s+by|limit|window)\b", re.IGNORECASE)
+IDENTIFIER = r"(?:[A-Za-z_]\w*|\"[^\"]*\"|`[^`]*`|\[[^\]]*\])"
+# An identifier, optionally table-qualified; a following "(" makes it a function name.
+COLUMN_REFERENCE_PATTERN = re.compile(rf"(?:({IDENTIFIER})\s*\.\s*)?({IDENTIFIER})(\s*\()?")
+STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+EXPRESSION_KEYWORDS = {
+    "case", "when", "then", "else", "end", "and", "or", "not", "null", "is", "in", "like", "glob", "between",
+    "collate", "nocase", "binary", "rtrim", "asc", "desc", "true", "false",
+}
+
+
+def table_aliases(query):
+    """Lower-cased table names and aliases in FROM/JOIN clauses, mapped to their table."""
+    aliases = {}
+    for table, alias in TABLE_REFERENCE_PATTERN.findall(query):
+        aliases[table.lower()] = table
+        if alias and alias.lower() not in NOT_ALIASES:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def nesting(query):
+    """
+    (text, depths): `query` with the contents of quoted strings and identifiers blanked, so character
+    positions still match `query`, and the parenthesis depth of every character (0 outside all parentheses).
+    """
+    text = QUOTED_PATTERN.sub(lambda m: m.group()[0] + " " * (len(m.group()) - 2) + m.group()[-1], query)
+    depths, depth = [], 0
+    for char in text:
+        depth += char == "("
+        depths.append(depth)
+        depth -= char == ")"
+    return text, depths
+
+
+def single_row(query):
+    """
+    Whether the statement aggregates without GROUP BY, so it returns one row however many it reads:
+    an aggregate call in its outermost SELECT, outside any subquery. min() and max() with more than
+    one argument are scalar functions and do not count.
+    """
+    text, depths = nesting(query)
+    top = "".join(char for char, d in zip(text, depths) if d == 0)
+    if MULTI_ROW_PATTERN.search(top):
+        return False
+    for match in AGGREGATE_CALL_PATTERN.finditer(text):
+        start = match.end() - 1
+        if start == 0 or depths[start - 1] != 0:
+            continue
+        end = start + 1
+        while end < len(text) and depths[end] > 0:
+            end += 1
+        arguments = "".join(char for char, d in zip(text[start + 1:end - 1], depths[start + 1:end - 1]) if d == 1)
+        if match.group(1).lower() not in ("min", "max") or "," not in arguments:
+            return True
+    return False
+
+
+def group_by_keys(query):
+    """
+    The expressions of the outermost GROUP BY, or None when the statement has none or is a compound
+    or window query, whose rows are not one per group.
+    """
+    text, depths = nesting(query)
+    top = "".join(char for char, d in zip(text, depths) if d == 0)
+    if UNGROUPED_PATTERN.search(top):
+        return None
+    start = next((m.end() for m in GROUP_BY_PATTERN.finditer(text) if depths[m.start()] == 0), None)
+    if start is None:
+        return None
+    end = next((m.start() for m in GROUP_BY_END_PATTERN.finditer(text, start) if depths[m.start()] == 0), len(text))
+    keys, key_start = [], start
+    for i in range(start, end):
+        if text[i] == "," and depths[i] == 0:
+            keys.append(query[key_start:i].strip())
+            key_start = i + 1
+    keys.append(query[key_start:end].strip().rstrip(";").strip())
+    return keys
+
+
+def column_references(expression):
+    """
+    [(qualifier or None, column)] read by a GROUP BY key, or None when it is an ordinal or reads no
+    column, so the columns it groups by are unknown.
+    """
+    expression = STRING_PATTERN.sub("''", expression)
+    references = []
+    for qualifier, name, call in COLUMN_REFERENCE_PATTERN.findall(expression):
+        if call or (not qualifier and name.lower() in EXPRESSION_KEYWORDS):
+            continue
+        references.append((unquote(qualifier) or None, unquote(name)))
+    return references or None
+
+
+def unquote(identifier):
+    if identifier[:1] in ('"', "`", "["):
+        return identifier[1:-1]
+    return identifier
+
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def query_plan(conn, query):
+    """Detail lines of the statement's EXPLAIN QUERY PLAN."""
+    return [detail for *_, detail in conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+
+
+def read_tables(conn):
+    """
+    ({table: estimated rows}, {table: indexed columns}, {table: columns}); max(rowid) stands in for
+    COUNT(*) where it can.
+    """
+    rows, indexed, columns_of = {}, {}, {}
+    names = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    for name in names:
+        try:
+            (count,) = conn.execute(f"SELECT max(rowid) FROM {quote(name)}").fetchone()
+        except sqlite3.OperationalError:  # WITHOUT ROWID table
+            (count,) = conn.execute(f"SELECT COUNT(*) FROM {quote(name)}").fetchone()
+        rows[name] = count or 0
+        columns = set()
+        for index in conn.execute(f"PRAGMA index_list({quote(name)})"):
+            columns.update(info[2] for info in conn.execute(f"PRAGMA index_info({quote(index[1])})") if info[2])
+        indexed[name] = sorted(columns)
+        columns_of[name] = [info[1] for info in conn.execute(f"PRAGMA table_info({quote(name)})")]
+    return rows, indexed, columns_of
+
+
+class PlanGuard:
+    """
+    Pre-flight EXPLAIN QUERY PLAN check for full scans of tables with at least `large_table_rows`
+    rows. Table sizes and indexes are read once per database version, and so are the distinct
+    counts of the columns GROUP BY queries group by.
+    """
+
+    def __init__(self, large_table_rows, result_rows):
+        self.large_table_rows = large_table_rows
+        self.result_rows = result_rows
+        self._tables = (None, {}, {}, {})
+        self._distinct = {}
+        self._lock = threading.Lock()
+
+    def _table_info(self, conn, version):
+        with self._lock:
+            if self._tables[0] != version:
+                self._tables = (version, *read_tables(conn))
+                self._distinct = {}
+            return self._tables[1:]
+
+    def _distinct_count(self, conn, table, column):
+        count = self._distinct.get((table, column))
+        if count is None:
+            # Outside the lock: on an unindexed column this reads the table once per database version.
+            (count,) = conn.execute(f"SELECT COUNT(DISTINCT {quote(column)}) FROM {quote(table)}").fetchone()
+            with self._lock:
+                self._distinct[(table, column)] = count
+        return count
+
+    def grouped_rows(self, conn, query, version):
+        """
+        Upper bound of the rows a GROUP BY query returns: the product of the distinct counts of the
+        columns its keys read. None when the query is not grouped or a key's columns are unknown,
+        e.g. an ordinal or an alias of a result column.
+        """
+        keys = group_by_keys(query)
+        if keys is None:
+            return None
+        _, _, columns_of = self._table_info(conn, version)
+        aliases = table_aliases(query)
+        tables = dict.fromkeys(aliases.values())
+        columns = set()
+        for key in keys:
+            references = column_references(key)
+            if references is None:
+                return None
+            for qualifier, name in references:
+                candidates = [aliases.get(qualifier.lower())] if qualifier else list(tables)
+                matches = [
+                    (table, column) for table in candidates if table in columns_of
+                    for column in columns_of[table] if column.lower() == name.lower()
+                ]
+                if not matches:
+                    return None
+                columns.add(matches[0])
+        groups = 1
+        for table, column in sorted(columns):
+            groups *= self._distinct_count(conn, table, column)
+        return groups
+
+    def check(self, conn, query, plan, version):
+        """
+        None, or a description of the large tables the query's `plan` scans without an index.
+        Aggregates that return a single row are let through: their scan is the answer, not a dump.
+        So are GROUP BY queries estimated to return at most `result_rows` groups.
+        """
+        if single_row(query):
+            return None
+        groups = self.grouped_rows(conn, query, version)
+        if groups is not None and groups <= self.result_rows:
+            return None
+        rows, indexed, _ = self._table_info(conn, version)
+        aliases = table_aliases(query)
+        scanned = []
+        for detail in plan:
+            match = SCAN_PATTERN.match(detail)
+            if match and not match.group(2).strip():
+                table = aliases.get(match.group(1).lower(), match.group(1))
+                if rows.get(table, 0) >= self.large_table_rows and table not in scanned:
+                    scanned.append(table)
+        if not scanned:
+            return None
+        return dict(
+            code="FULL_SCAN",
+            message=f"Query scans every row of {', '.join(scanned)} without an index",
+            tables={table: rows[table] for table in scanned},
+            indexed_columns={table: indexed[table] for table in scanned},
+            hint="Filter or join on an indexed column, or aggregate in SQL instead of reading rows",
+        )
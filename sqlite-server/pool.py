@@ -0,0 +1,103 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """No connection was returned to the pool within its timeout."""
+
+
+class ConnectionPool:
+    """
+    Fixed set of read-only SQLite connections reused across requests, so each keeps its page
+    cache, memory map and prepared statement cache warm. A checkout waits up to `timeout` seconds
+    for a free connection; checkout counts and wait times are kept for /stats.
+    """
+
+    def __init__(self, path, size, cache_size_kb=65536, mmap_size=1 << 30, cached_statements=256, timeout=30.0):
+        self.path = path
+        self.size = size
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro", uri=True, check_same_thread=False, cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA cache_size = -{self.cache_size_kb}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait(), False
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect(), False
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout), True
+        except queue.Empty:
+            raise PoolTimeout(f"no connection free within {self.timeout:g}s") from None
+
+    @contextmanager
+    def connection(self):
+        started = time.perf_counter()
+        conn, waited = self._acquire()
+        wait = time.perf_counter() - started
+        with self._lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        try:
+            yield conn
+        finally:
+            conn.set_progress_handler(None, 0)
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                size=self.size,
+                connections=self._created,
+                idle=self._idle.qsize(),
+                checkouts=self.checkouts,
+                waits=self.waits,
+                avg_wait_ms=self.wait_seconds / self.checkouts * 1000 if self.checkouts else 0.0,
+                max_wait_ms=self.max_wait_seconds * 1000,
+            )
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+from guard import PlanGuard, group_by_keys, query_plan
+
+LARGE_TABLE_ROWS = 5000
+RESULT_ROWS = 100
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE trans (trans_id INTEGER PRIMARY KEY, account_id INTEGER, type TEXT, amount INTEGER)")
+    conn.executemany(
+        "INSERT INTO trans VALUES (?, ?, ?, ?)",
+        ((i, i % 50, ("credit", "debit")[i % 2], i % 1000) for i in range(1, LARGE_TABLE_ROWS + 1)),
+    )
+    return conn
+
+
+def check(conn, query):
+    return PlanGuard(LARGE_TABLE_ROWS, RESULT_ROWS).check(conn, query, query_plan(conn, query), version=1)
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT type, SUM(amount) FROM trans GROUP BY type",
+    "SELECT t.account_id, t.type, COUNT(*) FROM trans AS t GROUP BY t.account_id, t.type HAVING COUNT(*) > 1",
+    'SELECT "account_id", AVG(amount) FROM trans GROUP BY "account_id" ORDER BY 2 DESC LIMIT 5',
+    "SELECT account_id % 10, COUNT(*) FROM trans GROUP BY account_id % 10",
+])
+def test_grouped_aggregates_with_few_groups_are_not_guarded(conn, query):
+    assert check(conn, query) is None
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM trans",
+    "SELECT trans_id, SUM(amount) FROM trans GROUP BY trans_id",
+    "SELECT amount, COUNT(*) FROM trans GROUP BY amount",
+    "SELECT type, COUNT(*) FROM trans GROUP BY 1",
+    "SELECT type, COUNT(*) FROM trans GROUP BY type UNION ALL SELECT type, amount FROM trans",
+])
+def test_scans_returning_many_or_unknown_rows_are_guarded(conn, query):
+    assert check(conn, query)["code"] == "FULL_SCAN"
+
+
+def test_group_by_keys_ignore_subqueries_and_trailing_clauses():
+    query = "SELECT type, COUNT(*) FROM trans WHERE account_id IN (SELECT account_id FROM trans GROUP BY account_id) " \
+            "GROUP BY type, (amount > 10) ORDER BY 2 LIMIT 3"
+    assert group_by_keys(query) == ["type", "(amount > 10)"]
+    assert group_by_keys("SELECT * FROM trans WHERE type IN (SELECT type FROM trans GROUP BY type)") is None
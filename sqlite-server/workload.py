@@ -0,0 +1,51 @@
+import json
+import os
+import re
+import threading
+import time
+
+from cache import QUOTED_PATTERN, normalize_sql
+
+# Numbers that are not part of an identifier such as t1 or a qualified name.
+NUMBER_PATTERN = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+
+
+def query_template(sql):
+    """Normalized SQL with string and number literals replaced by ?, so queries differing only in constants group together."""
+    parts = QUOTED_PATTERN.split(normalize_sql(sql))
+    return "".join(
+        ("?" if part.startswith("'") else part) if i % 2 else NUMBER_PATTERN.sub("?", part)
+        for i, part in enumerate(parts)
+    )
+
+
+class WorkloadLog:
+    """Append-only JSON lines log of executed queries, read back by advisor.py."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def record(self, query, **fields):
+        if not self.path:
+            return
+        line = json.dumps(dict(ts=time.time(), query=query, template=query_template(query), **fields), ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_workload(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)